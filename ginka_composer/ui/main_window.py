@@ -8,6 +8,7 @@
 import sys
 import json
 import os
+from itertools import chain
 from pathlib import Path
 from typing import Dict, List, Optional
 
@@ -19,11 +20,11 @@ from PyQt6.QtWidgets import (
     QMenuBar, QTextEdit, QDialog, QScrollArea
 )
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal
-from PyQt6.QtGui import QFont, QPainter, QPixmap, QColor, QAction
+from PyQt6.QtGui import QFont, QPainter, QPixmap, QAction
 
 from ..models import CharacterInstance, ImageLoader
 from ..widgets import LayerPreviewWindow, PreviewableCheckBox, PreviewableBackgroundItem
-from ..widgets.canvas import Canvas
+from ..widgets.canvas import create_canvas
 from ..utils import get_modern_style, organize_layers_by_type, pil_to_qpixmap_high_quality, get_alignment_system
 from .tabs import SceneTab, CharacterTab, LayerTab
 
@@ -51,6 +52,7 @@ class ModernCharacterComposer(QMainWindow):
         self.preview_timer = QTimer()
         self.preview_timer.timeout.connect(self.hidePreview)
         self.preview_timer.setSingleShot(True)
+        self._preview_layer_ids = []  # 图层面板中可预览图层的显示顺序，用于预取相邻预览
         
         self.setupUI()
         self.setupConnections()
@@ -179,7 +181,7 @@ class ModernCharacterComposer(QMainWindow):
         canvas_layout.addLayout(toolbar_layout)
         
         # 画布 - 占据剩余全部空间
-        self.canvas = Canvas()
+        self.canvas = create_canvas()
         self.canvas.setMinimumSize(600, 400)  # 设置最小尺寸
         canvas_layout.addWidget(self.canvas, 1)  # stretch=1 让画布占据全部剩余空间
         
@@ -251,6 +253,7 @@ class ModernCharacterComposer(QMainWindow):
         # 自定义部件信号连接
         self.character_tab.addCustomComponentRequested.connect(self.onAddCustomComponent)
         self.character_tab.removeCustomComponentRequested.connect(self.onRemoveCustomComponent)
+        self.character_tab.clearAllCustomComponentsRequested.connect(self.onClearCustomComponents)
         self.character_tab.customComponentSelected.connect(self.onCustomComponentSelected)
         self.character_tab.customComponentTransformChanged.connect(self.onCustomComponentTransformChanged)
         self.character_tab.moveCustomComponentRequested.connect(self.onMoveCustomComponent)
@@ -269,14 +272,6 @@ class ModernCharacterComposer(QMainWindow):
         # 图像加载连接
         self.image_loader.imageLoaded.connect(self.onImageLoaded)
         self.image_loader.loadProgress.connect(self.onLoadProgress)
-        
-        # 缩放同步连接
-        self.character_tab.scale_slider.valueChanged.connect(
-            lambda v: self.character_tab.scale_spinbox.setValue(v/100) if not self._updating_controls else None
-        )
-        self.character_tab.scale_spinbox.valueChanged.connect(
-            lambda v: self.character_tab.scale_slider.setValue(int(v*100)) if not self._updating_controls else None
-        )
     
     def loadCharacterData(self):
         """加载角色数据"""
@@ -326,6 +321,7 @@ class ModernCharacterComposer(QMainWindow):
                 bg_item = PreviewableBackgroundItem(bg_file, str(bg_path))
                 bg_item.backgroundSelected.connect(self.onBackgroundSelectedFromPreview)
                 bg_item.previewRequested.connect(self.showBackgroundPreview)
+                bg_item.previewLeft.connect(self.scheduleHidePreview)
                 self.scene_tab.bg_scroll_layout.addWidget(bg_item)
         
         self.scene_tab.bg_scroll_layout.addStretch()
@@ -375,6 +371,10 @@ class ModernCharacterComposer(QMainWindow):
         # 加载背景
         self.loadBackground()
     
+    def scheduleHidePreview(self):
+        """鼠标离开预览项目后稍作延迟再隐藏，移到下一个项目时会重新启动定时器"""
+        self.preview_timer.start(400)
+    
     def hidePreview(self):
         """隐藏预览窗口"""
         if self.preview_window:
@@ -475,7 +475,7 @@ class ModernCharacterComposer(QMainWindow):
             self.current_instance.y_offset = float(self.character_tab.y_spinbox.value())
             self.current_instance.scale = self.character_tab.scale_spinbox.value()
             
-            self.canvas.updateCharacterInstance(self.current_instance.instance_id)
+            self.canvas.updateCharacterTransform(self.current_instance.instance_id)
     
     def resetTransform(self):
         """重置变换"""
@@ -484,7 +484,7 @@ class ModernCharacterComposer(QMainWindow):
             self.current_instance.y_offset = 0.0
             self.current_instance.scale = 1.0
             self.updateTransformControls()
-            self.canvas.updateCharacterInstance(self.current_instance.instance_id)
+            self.canvas.updateCharacterTransform(self.current_instance.instance_id)
     
     def updateLayerUI(self):
         """更新图层UI"""
@@ -495,6 +495,7 @@ class ModernCharacterComposer(QMainWindow):
                 widget = item.widget()
                 if widget:
                     widget.setParent(None)
+        self._preview_layer_ids = []
         
         if not self.current_instance:
             return
@@ -515,7 +516,7 @@ class ModernCharacterComposer(QMainWindow):
             # 分组标题
             group_label = QLabel(f"=== {group_name} ===")
             group_label.setFont(QFont("Arial", 10, QFont.Weight.Bold))
-            group_label.setStyleSheet("color: #2c3e50; margin: 10px 0 5px 0;")
+            group_label.setProperty("variant", "group-title")
             self.layer_tab.layer_scroll_layout.addWidget(group_label)
             
             # 图层选项
@@ -533,19 +534,21 @@ class ModernCharacterComposer(QMainWindow):
                 checkbox.setChecked(is_selected)
                 checkbox.toggled.connect(lambda checked, l=layer: self.toggleLayer(l, checked))
                 checkbox.previewRequested.connect(self.showLayerPreview)
+                checkbox.previewLeft.connect(self.scheduleHidePreview)
                 layer_layout.addWidget(checkbox)
+                self._preview_layer_ids.append(layer_id)
                 
                 # 显示图层信息
                 info_text = f"{layer['size'][0]}×{layer['size'][1]}"
                 if layer['has_image']:
                     info_text += " ✓"
-                    info_color = "#27ae60"
+                    info_variant = "layer-ok"
                 else:
                     info_text += " ✗"
-                    info_color = "#e74c3c"
+                    info_variant = "layer-missing"
                 
                 info_label = QLabel(info_text)
-                info_label.setStyleSheet(f"color: {info_color}; font-weight: bold;")
+                info_label.setProperty("variant", info_variant)
                 layer_layout.addWidget(info_label)
                 
                 layer_layout.addStretch()
@@ -567,7 +570,8 @@ class ModernCharacterComposer(QMainWindow):
             # 自定义图层分组标题
             custom_group_label = QLabel("=== 自定义图层 ===")
             custom_group_label.setFont(QFont("Arial", 10, QFont.Weight.Bold))
-            custom_group_label.setStyleSheet("color: #8e44ad; margin: 10px 0 5px 0;")
+            custom_group_label.setProperty("variant", "group-title")
+            custom_group_label.setProperty("custom", True)
             self.layer_tab.layer_scroll_layout.addWidget(custom_group_label)
             
             for layer in custom_layers:
@@ -581,20 +585,20 @@ class ModernCharacterComposer(QMainWindow):
                 # 使用普通复选框（自定义图层）
                 checkbox = QCheckBox(f"{layer['name']} (自定义)")
                 checkbox.setChecked(True)  # 自定义图层一旦添加就选中
-                checkbox.setStyleSheet("color: #8e44ad; font-weight: bold;")
+                checkbox.setProperty("variant", "custom")
                 checkbox.toggled.connect(lambda checked, l=layer: self.toggleCustomLayer(l, checked))
                 layer_layout.addWidget(checkbox)
                 
                 # 显示图层信息
                 info_text = f"{layer['size'][0]}×{layer['size'][1]} ✓"
                 info_label = QLabel(info_text)
-                info_label.setStyleSheet("color: #8e44ad; font-weight: bold;")
+                info_label.setProperty("variant", "custom")
                 layer_layout.addWidget(info_label)
                 
                 # 删除按钮
                 delete_btn = QPushButton("删除")
                 delete_btn.setMaximumWidth(50)
-                delete_btn.setStyleSheet("QPushButton { background-color: #e74c3c; color: white; } QPushButton:hover { background-color: #c0392b; }")
+                delete_btn.setProperty("variant", "danger")
                 delete_btn.clicked.connect(lambda _, l=layer: self.removeCustomLayer(l))
                 layer_layout.addWidget(delete_btn)
                 
@@ -619,6 +623,14 @@ class ModernCharacterComposer(QMainWindow):
         self.preview_window.showPreview(layer['name'], png_file, layer)
         self.preview_window.showAtPosition(global_pos)
         
+        # 用户通常会依次扫过相邻图层，后台预取前后各3个图层的缩略图
+        if layer_id in self._preview_layer_ids:
+            index = self._preview_layer_ids.index(layer_id)
+            neighbours = self._preview_layer_ids[max(index - 3, 0):index] + self._preview_layer_ids[index + 1:index + 4]
+            self.preview_window.prefetchPreviews(
+                f"cr_data_png/{character_name}_{size}_{neighbour_id}.png" for neighbour_id in neighbours
+            )
+        
         # 设置定时器隐藏预览（如果鼠标离开）
         self.preview_timer.start(3000)  # 3秒后自动隐藏
     
@@ -864,30 +876,12 @@ class ModernCharacterComposer(QMainWindow):
     
     def updateLayerOrderDisplay(self):
         """更新图层顺序显示（包括自定义部件）"""
-        self.layer_tab.layer_order_list.clear()
-        
         if not self.current_instance:
+            self.layer_tab.setLayerOrderElements([])
             return
         
-        # 获取所有绘制元素（图层+自定义部件）
-        all_elements = self.getAllDrawElementsForDisplay()
-        
-        for i, element in enumerate(all_elements):
-            if element['type'] == 'layer':
-                layer = element['layer']
-                display_text = f"{i+1}. [图层] {layer['name']} (z:{element['z_order']})"
-                item = QListWidgetItem(display_text)
-                item.setData(Qt.ItemDataRole.UserRole, {'type': 'layer', 'id': element['id']})
-                
-            elif element['type'] == 'custom_component':
-                component = element['component']
-                display_text = f"{i+1}. [自定义] {component.name} (z:{element['z_order']})"
-                item = QListWidgetItem(display_text)
-                item.setData(Qt.ItemDataRole.UserRole, {'type': 'custom_component', 'name': component.name})
-                # 用不同的颜色标识自定义部件
-                item.setBackground(QColor(240, 248, 255))  # 淡蓝色背景
-                
-            self.layer_tab.layer_order_list.addItem(item)
+        # 获取所有绘制元素（图层+自定义部件），由列表模型按行读取
+        self.layer_tab.setLayerOrderElements(self.getAllDrawElementsForDisplay())
     
     def getAllDrawElementsForDisplay(self):
         """获取当前角色实例的所有绘制元素，用于显示"""
@@ -927,7 +921,7 @@ class ModernCharacterComposer(QMainWindow):
         if not self.current_instance:
             return
         
-        current_row = self.layer_tab.layer_order_list.currentRow()
+        current_row = self.layer_tab.currentLayerRow()
         if current_row < 0:
             return
         
@@ -947,7 +941,7 @@ class ModernCharacterComposer(QMainWindow):
         self.setElementZOrder(next_element, current_z)
         
         self.updateLayerOrderDisplay()
-        self.layer_tab.layer_order_list.setCurrentRow(current_row + 1)
+        self.layer_tab.setCurrentLayerRow(current_row + 1)
         self.canvas.updateCharacterInstance(self.current_instance.instance_id)
     
     def moveLayerDown(self):
@@ -955,7 +949,7 @@ class ModernCharacterComposer(QMainWindow):
         if not self.current_instance:
             return
         
-        current_row = self.layer_tab.layer_order_list.currentRow()
+        current_row = self.layer_tab.currentLayerRow()
         if current_row <= 0:
             return  # 已经在最底层
         
@@ -975,7 +969,7 @@ class ModernCharacterComposer(QMainWindow):
         self.setElementZOrder(prev_element, current_z)
         
         self.updateLayerOrderDisplay()
-        self.layer_tab.layer_order_list.setCurrentRow(current_row - 1)
+        self.layer_tab.setCurrentLayerRow(current_row - 1)
         self.canvas.updateCharacterInstance(self.current_instance.instance_id)
     
     def moveLayerToTop(self):
@@ -983,7 +977,7 @@ class ModernCharacterComposer(QMainWindow):
         if not self.current_instance:
             return
         
-        current_row = self.layer_tab.layer_order_list.currentRow()
+        current_row = self.layer_tab.currentLayerRow()
         if current_row < 0:
             return
         
@@ -1005,7 +999,7 @@ class ModernCharacterComposer(QMainWindow):
         if not self.current_instance:
             return
         
-        current_row = self.layer_tab.layer_order_list.currentRow()
+        current_row = self.layer_tab.currentLayerRow()
         if current_row < 0:
             return
         
@@ -1176,7 +1170,7 @@ class ModernCharacterComposer(QMainWindow):
             
             self.updateInstanceList()
             self.updateTransformControls()
-            self.canvas.update()
+            self.canvas.refreshZOrder()
     
     def moveCharacterBackward(self):
         """角色后移一层"""
@@ -1203,7 +1197,7 @@ class ModernCharacterComposer(QMainWindow):
             
             self.updateInstanceList()
             self.updateTransformControls()
-            self.canvas.update()
+            self.canvas.refreshZOrder()
     
     def moveCharacterToFront(self):
         """角色移到最前"""
@@ -1218,7 +1212,7 @@ class ModernCharacterComposer(QMainWindow):
             self.current_instance.z_order = max_z + 1
             self.updateInstanceList()
             self.updateTransformControls()
-            self.canvas.update()
+            self.canvas.refreshZOrder()
     
     def moveCharacterToBack(self):
         """角色移到最后"""
@@ -1233,7 +1227,7 @@ class ModernCharacterComposer(QMainWindow):
             self.current_instance.z_order = min_z - 1
             self.updateInstanceList()
             self.updateTransformControls()
-            self.canvas.update()
+            self.canvas.refreshZOrder()
     
     def exportImage(self):
         """导出图像 - 高清无损渲染"""
@@ -1819,21 +1813,20 @@ class ModernCharacterComposer(QMainWindow):
                             char_info = self.character_data[char_data['character_name']]
                             size_data = char_info['layer_mapping'].get(char_data['size'], {})
                             
-                            # 收集所有分组中的图层
-                            all_layers = []
-                            for group_name, group_layers in size_data.items():
-                                all_layers.extend(group_layers)
+                            # 按图层ID索引所有分组中的图层（ID重复时保留第一个）
+                            layers_by_id = {}
+                            for layer in chain.from_iterable(size_data.values()):
+                                layers_by_id.setdefault(layer['layer_id'], layer)
                             
                             for layer_id in char_data.get('layers', []):
-                                for layer in all_layers:
-                                    if layer['layer_id'] == layer_id:
-                                        instance.composition_layers[layer_id] = layer
-                                        
-                                        # 加载对应的图像文件
-                                        png_file = f"cr_data_png/{char_data['character_name']}_{char_data['size']}_{layer_id}.png"
-                                        if os.path.exists(png_file):
-                                            self.image_loader.addTask(layer_id, png_file)
-                                        break
+                                layer = layers_by_id.get(layer_id)
+                                if layer is not None:
+                                    instance.composition_layers[layer_id] = layer
+                                    
+                                    # 加载对应的图像文件
+                                    png_file = f"cr_data_png/{char_data['character_name']}_{char_data['size']}_{layer_id}.png"
+                                    if os.path.exists(png_file):
+                                        self.image_loader.addTask(layer_id, png_file)
                     
                     self.character_instances[instance.instance_id] = instance
                     self.canvas.addCharacterInstance(instance.instance_id, instance)
@@ -1915,6 +1908,22 @@ class ModernCharacterComposer(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"移除自定义部件失败: {e}")
     
+    def onClearCustomComponents(self):
+        """清空当前角色的所有自定义部件"""
+        if not self.current_instance:
+            return
+        
+        try:
+            # 一次性清空数据模型和UI列表
+            self.current_instance.custom_components.clear_all()
+            self.character_tab.component_list.clear()
+            
+            # 只触发一次画布重绘
+            self.canvas.updateCharacterInstance(self.current_instance.instance_id)
+            
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"清空自定义部件失败: {e}")
+    
     def onCustomComponentSelected(self, component_name: str):
         """自定义部件选择事件"""
         if not self.current_instance:
@@ -9,10 +9,19 @@ from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QLabel, QComboBox,
     QPushButton, QScrollArea, QButtonGroup, QRadioButton, QListWidget,
     QSpinBox, QDoubleSpinBox, QSlider, QFrame, QFileDialog, QMessageBox,
-    QListWidgetItem, QTabWidget
+    QListWidgetItem, QTabWidget, QListView
 )
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QFont
+from PyQt6.QtCore import Qt, pyqtSignal, QAbstractListModel, QModelIndex
+from PyQt6.QtGui import QFont, QColor
+
+from ..utils import set_style_variant
+
+# 常用枚举值，模块加载时绑定一次
+_H = Qt.Orientation.Horizontal
+_BOLD = QFont.Weight.Bold
+_YES = QMessageBox.StandardButton.Yes
+_NO = QMessageBox.StandardButton.No
+_DIRECT = Qt.ConnectionType.DirectConnection
 
 
 class SceneTab(QWidget):
@@ -61,7 +70,7 @@ class SceneTab(QWidget):
         
         # 背景预览选择区域
         bg_preview_label = QLabel("背景预览选择:")
-        bg_preview_label.setFont(QFont("Arial", 10, QFont.Weight.Bold))
+        bg_preview_label.setFont(QFont("Arial", 10, _BOLD))
         bg_layout.addWidget(bg_preview_label)
         
         # 创建背景滚动区域
@@ -111,9 +120,9 @@ class SceneTab(QWidget):
         
         self.export_btn = QPushButton("导出图片")
         self.export_hd_btn = QPushButton("高清导出")
-        self.export_hd_btn.setStyleSheet("QPushButton { background-color: #28a745; } QPushButton:hover { background-color: #218838; }")
+        self.export_hd_btn.setProperty("variant", "success")
         self.export_character_btn = QPushButton("导出立牌")
-        self.export_character_btn.setStyleSheet("QPushButton { background-color: #17a2b8; color: white; } QPushButton:hover { background-color: #138496; }")
+        self.export_character_btn.setProperty("variant", "info")
         self.save_scene_btn = QPushButton("保存场景")
         self.load_scene_btn = QPushButton("加载场景")
         
@@ -164,6 +173,7 @@ class CharacterTab(QWidget):
     # 自定义部件信号
     addCustomComponentRequested = pyqtSignal(str)  # image_path
     removeCustomComponentRequested = pyqtSignal(str)  # component_name
+    clearAllCustomComponentsRequested = pyqtSignal()
     customComponentSelected = pyqtSignal(str)  # component_name
     customComponentTransformChanged = pyqtSignal(str, int, int, float)  # name, x, y, scale
     moveCustomComponentRequested = pyqtSignal(str, str)  # component_name, direction ('up', 'down', 'front', 'back')
@@ -246,7 +256,7 @@ class CharacterTab(QWidget):
         # X偏移
         x_layout = QHBoxLayout()
         x_layout.addWidget(QLabel("X:"))
-        self.x_slider = QSlider(Qt.Orientation.Horizontal)
+        self.x_slider = QSlider(_H)
         self.x_slider.setRange(-1000, 1000)
         self.x_spinbox = QSpinBox()
         self.x_spinbox.setRange(-2000, 2000)
@@ -257,7 +267,7 @@ class CharacterTab(QWidget):
         # Y偏移
         y_layout = QHBoxLayout()
         y_layout.addWidget(QLabel("Y:"))
-        self.y_slider = QSlider(Qt.Orientation.Horizontal)
+        self.y_slider = QSlider(_H)
         self.y_slider.setRange(-1000, 1000)
         self.y_spinbox = QSpinBox()
         self.y_spinbox.setRange(-2000, 2000)
@@ -268,7 +278,7 @@ class CharacterTab(QWidget):
         # 缩放
         scale_layout = QHBoxLayout()
         scale_layout.addWidget(QLabel("缩放:"))
-        self.scale_slider = QSlider(Qt.Orientation.Horizontal)
+        self.scale_slider = QSlider(_H)
         self.scale_slider.setRange(1, 1000)  # 0.01 to 10.0
         self.scale_slider.setValue(100)
         self.scale_spinbox = QDoubleSpinBox()
@@ -292,7 +302,7 @@ class CharacterTab(QWidget):
         zorder_info_layout = QHBoxLayout()
         zorder_info_layout.addWidget(QLabel("当前层级:"))
         self.zorder_label = QLabel("0")
-        self.zorder_label.setStyleSheet("color: #007bff; font-weight: bold;")
+        self.zorder_label.setProperty("variant", "accent")
         zorder_info_layout.addWidget(self.zorder_label)
         zorder_info_layout.addStretch()
         zorder_layout.addLayout(zorder_info_layout)
@@ -332,7 +342,8 @@ class CharacterTab(QWidget):
 • 可以调整部件的位置、缩放和层级
         """)
         info_text.setWordWrap(True)
-        info_text.setStyleSheet("color: #555; font-size: 11px; padding: 10px;")
+        info_text.setProperty("variant", "help")
+        info_text.setMargin(10)
         info_layout.addWidget(info_text)
         
         layout.addWidget(info_group)
@@ -342,16 +353,7 @@ class CharacterTab(QWidget):
         current_layout = QVBoxLayout(current_group)
         
         self.current_character_label = QLabel("未选择角色")
-        self.current_character_label.setStyleSheet("""
-            QLabel {
-                background-color: #f8f9fa;
-                border: 1px solid #dee2e6;
-                border-radius: 4px;
-                padding: 8px;
-                font-weight: bold;
-                color: #6c757d;
-            }
-        """)
+        self.current_character_label.setProperty("variant", "badge")
         current_layout.addWidget(self.current_character_label)
         
         layout.addWidget(current_group)
@@ -362,29 +364,14 @@ class CharacterTab(QWidget):
         
         # 说明文字
         info_label = QLabel("为当前角色添加自定义图片部件")
-        info_label.setStyleSheet("color: #666; font-size: 11px;")
+        info_label.setProperty("variant", "hint")
         add_comp_layout.addWidget(info_label)
         
         # 添加按钮
         self.add_component_btn = QPushButton("选择图片文件")
         self.add_component_btn.setMinimumHeight(35)
         self.add_component_btn.setEnabled(False)  # 默认禁用
-        self.add_component_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #28a745;
-                color: white;
-                border: none;
-                border-radius: 6px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #218838;
-            }
-            QPushButton:disabled {
-                background-color: #6c757d;
-                color: #dee2e6;
-            }
-        """)
+        self.add_component_btn.setProperty("variant", "success")
         add_comp_layout.addWidget(self.add_component_btn)
         
         layout.addWidget(add_comp_group)
@@ -417,7 +404,7 @@ class CharacterTab(QWidget):
         # X偏移
         comp_x_layout = QHBoxLayout()
         comp_x_layout.addWidget(QLabel("X:"))
-        self.comp_x_slider = QSlider(Qt.Orientation.Horizontal)
+        self.comp_x_slider = QSlider(_H)
         self.comp_x_slider.setRange(-1000, 1000)
         self.comp_x_slider.setEnabled(False)
         self.comp_x_spinbox = QSpinBox()
@@ -430,7 +417,7 @@ class CharacterTab(QWidget):
         # Y偏移
         comp_y_layout = QHBoxLayout()
         comp_y_layout.addWidget(QLabel("Y:"))
-        self.comp_y_slider = QSlider(Qt.Orientation.Horizontal)
+        self.comp_y_slider = QSlider(_H)
         self.comp_y_slider.setRange(-1000, 1000)
         self.comp_y_slider.setEnabled(False)
         self.comp_y_spinbox = QSpinBox()
@@ -443,7 +430,7 @@ class CharacterTab(QWidget):
         # 缩放
         comp_scale_layout = QHBoxLayout()
         comp_scale_layout.addWidget(QLabel("缩放:"))
-        self.comp_scale_slider = QSlider(Qt.Orientation.Horizontal)
+        self.comp_scale_slider = QSlider(_H)
         self.comp_scale_slider.setRange(1, 1000)  # 0.01 to 10.0
         self.comp_scale_slider.setValue(100)
         self.comp_scale_slider.setEnabled(False)
@@ -483,6 +470,15 @@ class CharacterTab(QWidget):
         
         layout.addWidget(comp_zorder_group)
         layout.addStretch()
+        
+        # 部件变换相关控件，统一启用/禁用
+        self._comp_xform_widgets = (
+            self.comp_x_slider, self.comp_x_spinbox,
+            self.comp_y_slider, self.comp_y_spinbox,
+            self.comp_scale_slider, self.comp_scale_spinbox,
+            self.comp_move_up_btn, self.comp_move_down_btn,
+            self.comp_move_front_btn, self.comp_move_back_btn
+        )
     
     def setupConnections(self):
         """设置信号连接"""
@@ -569,14 +565,11 @@ class CharacterTab(QWidget):
             self, 
             "确认清空", 
             "确定要删除所有自定义部件吗？",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            _YES | _NO
         )
         
-        if reply == QMessageBox.StandardButton.Yes:
-            for i in range(self.component_list.count()):
-                item = self.component_list.item(i)
-                if item:
-                    self.removeCustomComponentRequested.emit(item.text())
+        if reply == _YES:
+            self.clearAllCustomComponentsRequested.emit()
     
     def onCustomComponentSelected(self, row):
         """自定义部件选择事件"""
@@ -680,16 +673,7 @@ class CharacterTab(QWidget):
         # 更新当前角色显示
         if instance:
             self.current_character_label.setText(f"角色: {instance.name}")
-            self.current_character_label.setStyleSheet("""
-                QLabel {
-                    background-color: #d4edda;
-                    border: 1px solid #c3e6cb;
-                    border-radius: 4px;
-                    padding: 8px;
-                    font-weight: bold;
-                    color: #155724;
-                }
-            """)
+            set_style_variant(self.current_character_label, "active", True)
             
             # 启用所有自定义部件控件
             self.add_component_btn.setEnabled(True)
@@ -699,22 +683,13 @@ class CharacterTab(QWidget):
             
             # 更新部件列表
             self.component_list.clear()
-            if hasattr(instance, 'custom_components'):
-                for component in instance.custom_components.components:
-                    self.addCustomComponentToList(component.name)
+            comps = getattr(instance, 'custom_components', None)
+            if comps is not None:
+                self.component_list.addItems([c.name for c in comps.components])
             
         else:
             self.current_character_label.setText("未选择角色")
-            self.current_character_label.setStyleSheet("""
-                QLabel {
-                    background-color: #f8f9fa;
-                    border: 1px solid #dee2e6;
-                    border-radius: 4px;
-                    padding: 8px;
-                    font-weight: bold;
-                    color: #6c757d;
-                }
-            """)
+            set_style_variant(self.current_character_label, "active", False)
             
             # 禁用所有自定义部件控件
             self.add_component_btn.setEnabled(False)
@@ -728,16 +703,56 @@ class CharacterTab(QWidget):
     
     def enableCustomComponentTransformControls(self, enable: bool):
         """启用/禁用自定义部件变换控件"""
-        self.comp_x_slider.setEnabled(enable)
-        self.comp_x_spinbox.setEnabled(enable)
-        self.comp_y_slider.setEnabled(enable)
-        self.comp_y_spinbox.setEnabled(enable)
-        self.comp_scale_slider.setEnabled(enable)
-        self.comp_scale_spinbox.setEnabled(enable)
-        self.comp_move_up_btn.setEnabled(enable)
-        self.comp_move_down_btn.setEnabled(enable)
-        self.comp_move_front_btn.setEnabled(enable)
-        self.comp_move_back_btn.setEnabled(enable)
+        for widget in self._comp_xform_widgets:
+            widget.setEnabled(enable)
+
+
+class LayerOrderModel(QAbstractListModel):
+    """图层顺序列表模型，直接读取绘制元素列表（图层+自定义部件），不为每行创建条目对象"""
+    
+    CUSTOM_BACKGROUND = QColor(240, 248, 255)  # 自定义部件使用淡蓝色背景
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._elements = []
+    
+    def setElements(self, elements):
+        """设置绘制元素列表，行数不变时只通知数据变化"""
+        if len(elements) == len(self._elements) and elements:
+            self._elements = elements
+            self.dataChanged.emit(self.index(0), self.index(len(elements) - 1))
+        else:
+            self.beginResetModel()
+            self._elements = elements
+            self.endResetModel()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._elements)
+    
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        
+        row = index.row()
+        element = self._elements[row]
+        is_layer = element['type'] == 'layer'
+        
+        if role == Qt.ItemDataRole.DisplayRole:
+            if is_layer:
+                return f"{row+1}. [图层] {element['layer']['name']} (z:{element['z_order']})"
+            return f"{row+1}. [自定义] {element['component'].name} (z:{element['z_order']})"
+        if role == Qt.ItemDataRole.UserRole:
+            if is_layer:
+                return {'type': 'layer', 'id': element['id']}
+            return {'type': 'custom_component', 'name': element['component'].name}
+        if role == Qt.ItemDataRole.BackgroundRole and not is_layer:
+            return self.CUSTOM_BACKGROUND
+        return None
 
 
 class LayerTab(QWidget):
@@ -753,7 +768,6 @@ class LayerTab(QWidget):
     def __init__(self):
         super().__init__()
         self.setupUI()
-        self.setupConnections()
     
     def setupUI(self):
         """设置UI"""
@@ -775,32 +789,46 @@ class LayerTab(QWidget):
         layer_layout.addWidget(scroll_area)
         layout.addWidget(layer_group)
         
-        # 图层顺序组
+        # 图层顺序组（构建期间暂停更新，子控件创建完后统一刷新）
         order_group = QGroupBox("图层顺序")
+        order_group.setUpdatesEnabled(False)
         order_layout = QVBoxLayout(order_group)
         
-        self.layer_order_list = QListWidget()
+        self.layer_order_model = LayerOrderModel(self)
+        self.layer_order_list = QListView()
+        self.layer_order_list.setProperty("variant", "layer-order")
+        self.layer_order_list.setModel(self.layer_order_model)
         self.layer_order_list.setMinimumHeight(120)
         order_layout.addWidget(self.layer_order_list)
         
+        # 顺序调整按钮：信号直接转发到信号，点击时不经过 Python 层的 emit 调用
         order_btn_layout = QHBoxLayout()
-        self.move_up_btn = QPushButton("↑")
-        self.move_down_btn = QPushButton("↓")
-        self.move_top_btn = QPushButton("置顶")
-        self.move_bottom_btn = QPushButton("置底")
-        
-        order_btn_layout.addWidget(self.move_up_btn)
-        order_btn_layout.addWidget(self.move_down_btn)
-        order_btn_layout.addWidget(self.move_top_btn)
-        order_btn_layout.addWidget(self.move_bottom_btn)
+        for attr, text, signal in (
+            ('move_up_btn', "↑", self.moveLayerUpRequested),
+            ('move_down_btn', "↓", self.moveLayerDownRequested),
+            ('move_top_btn', "置顶", self.moveLayerToTopRequested),
+            ('move_bottom_btn', "置底", self.moveLayerToBottomRequested),
+        ):
+            button = QPushButton(text)
+            button.clicked.connect(signal, _DIRECT)
+            order_btn_layout.addWidget(button)
+            setattr(self, attr, button)
         order_layout.addLayout(order_btn_layout)
         
+        order_group.setUpdatesEnabled(True)
         layout.addWidget(order_group)
         layout.addStretch()
     
-    def setupConnections(self):
-        """设置信号连接"""
-        self.move_up_btn.clicked.connect(self.moveLayerUpRequested.emit)
-        self.move_down_btn.clicked.connect(self.moveLayerDownRequested.emit)
-        self.move_top_btn.clicked.connect(self.moveLayerToTopRequested.emit)
-        self.move_bottom_btn.clicked.connect(self.moveLayerToBottomRequested.emit)
+    def setLayerOrderElements(self, elements):
+        """更新图层顺序列表，并清除当前选中行"""
+        self.layer_order_model.setElements(elements)
+        self.layer_order_list.selectionModel().clear()
+    
+    def currentLayerRow(self):
+        """获取图层顺序列表的当前行，无选中时返回-1"""
+        index = self.layer_order_list.currentIndex()
+        return index.row() if index.isValid() else -1
+    
+    def setCurrentLayerRow(self, row):
+        """设置图层顺序列表的当前行"""
+        self.layer_order_list.setCurrentIndex(self.layer_order_model.index(row))
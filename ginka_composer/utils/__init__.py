@@ -5,405 +5,263 @@
 包含样式管理、图像处理等工具函数
 """
 
+import functools
 import os
+import re
+import sys
+import weakref
+from collections import OrderedDict
 from pathlib import Path
 from PyQt6.QtGui import QPixmap, QImage
 
 try:
+    import PIL
     from PIL import Image
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
 
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+# Pillow-SIMD 的版本号带 .post 后缀，其重采样本身已向量化，此时直接使用 Pillow；
+# 否则若安装了 OpenCV，则由 cv2.resize 完成缩放
+PILLOW_SIMD = PIL_AVAILABLE and '.post' in PIL.__version__
+_USE_CV2_RESIZE = CV2_AVAILABLE and not PILLOW_SIMD
+
+
+# 现代化样式表文件，随包一起分发
+_STYLE_PATH = Path(__file__).resolve().parent.parent / "resources" / "modern.qss"
+
+
+@functools.cache
+def _load_modern_style():
+    """读取现代化样式表文件，每个进程只读取一次"""
+    try:
+        return _STYLE_PATH.read_text(encoding="utf-8")
+    except OSError as e:
+        print(f"样式表加载失败: {e}")
+        return ""
+
 
 def get_modern_style():
     """获取现代化样式表"""
-    return """
-    /* 主窗口样式 */
-    QMainWindow {
-        background-color: #2b2b2b;
-        color: #ffffff;
-    }
-
-    /* 标签页样式 */
-    QTabWidget::pane {
-        border: 1px solid #555555;
-        background-color: #3c3c3c;
-    }
-
-    QTabBar::tab {
-        background-color: #4a4a4a;
-        color: #ffffff;
-        padding: 8px 16px;
-        margin-right: 2px;
-        border-top-left-radius: 6px;
-        border-top-right-radius: 6px;
-    }
-
-    QTabBar::tab:selected {
-        background-color: #007bff;
-    }
-
-    QTabBar::tab:hover {
-        background-color: #0056b3;
-    }
-
-    /* 分组框样式 */
-    QGroupBox {
-        font-weight: bold;
-        border: 2px solid #555555;
-        border-radius: 8px;
-        margin-top: 1ex;
-        color: #ffffff;
-        background-color: #3c3c3c;
-    }
-
-    QGroupBox::title {
-        subcontrol-origin: margin;
-        left: 10px;
-        padding: 0 8px 0 8px;
-        color: #007bff;
-        font-size: 12px;
-    }
-
-    /* 按钮样式 */
-    QPushButton {
-        background-color: #007bff;
-        border: none;
-        color: white;
-        padding: 8px 16px;
-        font-size: 12px;
-        border-radius: 6px;
-        font-weight: bold;
-    }
-
-    QPushButton:hover {
-        background-color: #0056b3;
-    }
-
-    QPushButton:pressed {
-        background-color: #004085;
-    }
-
-    QPushButton:disabled {
-        background-color: #6c757d;
-        color: #adb5bd;
-    }
-
-    /* 下拉框样式 */
-    QComboBox {
-        border: 2px solid #555555;
-        border-radius: 6px;
-        padding: 6px;
-        background-color: #4a4a4a;
-        color: #ffffff;
-        font-weight: bold;
-    }
-
-    QComboBox:hover {
-        border-color: #007bff;
-    }
-
-    QComboBox::drop-down {
-        subcontrol-origin: padding;
-        subcontrol-position: top right;
-        width: 20px;
-        border-left: 1px solid #555555;
-        background-color: #555555;
-        border-top-right-radius: 6px;
-        border-bottom-right-radius: 6px;
-    }
-
-    QComboBox::down-arrow {
-        image: none;
-        border-left: 5px solid transparent;
-        border-right: 5px solid transparent;
-        border-top: 5px solid #ffffff;
-    }
-
-    QComboBox QAbstractItemView {
-        border: 2px solid #007bff;
-        background-color: #4a4a4a;
-        color: #ffffff;
-        selection-background-color: #007bff;
-    }
-
-    /* 滑块样式 */
-    QSlider::groove:horizontal {
-        border: 1px solid #555555;
-        height: 8px;
-        background: #4a4a4a;
-        margin: 2px 0;
-        border-radius: 4px;
-    }
-
-    QSlider::handle:horizontal {
-        background: #007bff;
-        border: 1px solid #0056b3;
-        width: 18px;
-        margin: -2px 0;
-        border-radius: 9px;
-    }
-
-    QSlider::handle:horizontal:hover {
-        background: #0056b3;
-    }
-
-    /* 数值输入框样式 */
-    QSpinBox, QDoubleSpinBox {
-        border: 2px solid #555555;
-        border-radius: 4px;
-        padding: 4px;
-        background-color: #4a4a4a;
-        color: #ffffff;
-        font-weight: bold;
-    }
-
-    QSpinBox:hover, QDoubleSpinBox:hover {
-        border-color: #007bff;
-    }
-
-    QSpinBox::up-button, QDoubleSpinBox::up-button {
-        background-color: #555555;
-        border-left: 1px solid #666666;
-        border-bottom: 1px solid #666666;
-        border-top-right-radius: 4px;
-    }
-
-    QSpinBox::down-button, QDoubleSpinBox::down-button {
-        background-color: #555555;
-        border-left: 1px solid #666666;
-        border-top: 1px solid #666666;
-        border-bottom-right-radius: 4px;
-    }
-
-    QSpinBox::up-button:hover, QDoubleSpinBox::up-button:hover,
-    QSpinBox::down-button:hover, QDoubleSpinBox::down-button:hover {
-        background-color: #007bff;
-    }
-
-    /* 列表样式 */
-    QListWidget {
-        border: 2px solid #555555;
-        border-radius: 6px;
-        background-color: #4a4a4a;
-        color: #ffffff;
-        padding: 4px;
-    }
-
-    QListWidget::item {
-        padding: 6px;
-        border-bottom: 1px solid #555555;
-        border-radius: 3px;
-        margin: 1px;
-    }
-
-    QListWidget::item:selected {
-        background-color: #007bff;
-        color: #ffffff;
-    }
-
-    QListWidget::item:hover {
-        background-color: #0056b3;
-    }
-
-    /* 复选框样式 */
-    QCheckBox {
-        color: #ffffff;
-        font-weight: bold;
-    }
-
-    QCheckBox::indicator {
-        width: 18px;
-        height: 18px;
-        border: 2px solid #555555;
-        border-radius: 3px;
-        background-color: #4a4a4a;
-    }
-
-    QCheckBox::indicator:checked {
-        background-color: #007bff;
-        border-color: #0056b3;
-    }
-
-    QCheckBox::indicator:hover {
-        border-color: #007bff;
-    }
-
-    /* 单选按钮样式 */
-    QRadioButton {
-        color: #ffffff;
-        font-weight: bold;
-    }
-
-    QRadioButton::indicator {
-        width: 18px;
-        height: 18px;
-        border: 2px solid #555555;
-        border-radius: 9px;
-        background-color: #4a4a4a;
-    }
-
-    QRadioButton::indicator:checked {
-        background-color: #007bff;
-        border-color: #0056b3;
-    }
-
-    QRadioButton::indicator:hover {
-        border-color: #007bff;
-    }
-
-    /* 滚动区域样式 */
-    QScrollArea {
-        border: 1px solid #555555;
-        border-radius: 6px;
-        background-color: #4a4a4a;
-    }
-
-    QScrollBar:vertical {
-        background-color: #4a4a4a;
-        width: 12px;
-        border-radius: 6px;
-    }
-
-    QScrollBar::handle:vertical {
-        background-color: #007bff;
-        border-radius: 6px;
-    }
-
-    QScrollBar::handle:vertical:hover {
-        background-color: #0056b3;
-    }
-
-    /* 标签样式 */
-    QLabel {
-        color: #ffffff;
-    }
-
-    /* 工具栏样式 */
-    QToolBar {
-        background-color: #3c3c3c;
-        border: none;
-        spacing: 8px;
-    }
-
-    QToolBar QToolButton {
-        background-color: #4a4a4a;
-        border: 1px solid #555555;
-        border-radius: 4px;
-        padding: 6px;
-        color: #ffffff;
-    }
-
-    QToolBar QToolButton:hover {
-        background-color: #007bff;
-        border-color: #0056b3;
-    }
-
-    /* 状态栏样式 */
-    QStatusBar {
-        background-color: #3c3c3c;
-        color: #ffffff;
-        border-top: 1px solid #555555;
-    }
-
-    /* 进度条样式 */
-    QProgressBar {
-        border: 2px solid #555555;
-        border-radius: 6px;
-        text-align: center;
-        color: #ffffff;
-        background-color: #4a4a4a;
-        font-weight: bold;
-    }
-
-    QProgressBar::chunk {
-        background-color: #007bff;
-        border-radius: 4px;
-    }
-
-    /* 分割器样式 */
-    QSplitter::handle {
-        background-color: #555555;
-    }
-
-    QSplitter::handle:horizontal {
-        width: 2px;
-    }
-
-    QSplitter::handle:vertical {
-        height: 2px;
-    }
-
-    QSplitter::handle:pressed {
-        background-color: #007bff;
-    }
-    """
+    return _load_modern_style()
+
+
+def set_style_variant(widget, name, value):
+    """设置样式表选择器使用的动态属性，并仅对该控件重新应用样式"""
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+
+
+# 图层分组，按判断优先级排列，最后一项为兜底分组
+_LAYER_GROUPS = ('眉毛', '眼睛', '嘴巴', '脸颊', '身体', '服装', '其他')
+_OTHER_RANK = len(_LAYER_GROUPS) - 1
+
+# 单字关键词 -> 分组序号（序号越小优先级越高）
+_CHAR_TO_BUCKET = {
+    '眉': 0,
+    '目': 1, '眼': 1,
+    '口': 2, '嘴': 2,
+    '頬': 3, '脸': 3,
+    '身': 4,
+    '装': 5, '服': 5,
+}
+_BODY_RANK = 4
+_CLOTH_RANK = 5
+_CLOTH_CODE_RE = re.compile(r"h[1-4]")
+
+
+def _layer_bucket_rank(name):
+    """返回图层名称所属分组的序号，命中多个关键词时取优先级最高的"""
+    best = _OTHER_RANK
+    get = _CHAR_TO_BUCKET.get
+    for ch in name:
+        rank = get(ch, best)
+        if rank < best:
+            best = rank
+            if rank == 0:
+                break
+    
+    # 多字符关键词只在单字关键词无法给出更高优先级时检查
+    if best > _BODY_RANK and 'base' in name:
+        best = _BODY_RANK
+    elif best > _CLOTH_RANK and _CLOTH_CODE_RE.search(name):
+        best = _CLOTH_RANK
+    return best
 
 
 def organize_layers_by_type(layers):
     """根据图层名称智能分组"""
-    groups = {
-        '眉毛': [],
-        '眼睛': [],
-        '嘴巴': [],
-        '脸颊': [],
-        '身体': [],
-        '服装': [],
-        '其他': []
-    }
+    buckets = [[] for _ in _LAYER_GROUPS]
     
     for layer in layers:
-        name = layer['name']
-        if '眉' in name:
-            groups['眉毛'].append(layer)
-        elif '目' in name or '眼' in name:
-            groups['眼睛'].append(layer)
-        elif '口' in name or '嘴' in name:
-            groups['嘴巴'].append(layer)
-        elif '頬' in name or '脸' in name:
-            groups['脸颊'].append(layer)
-        elif 'base' in name or '身' in name:
-            groups['身体'].append(layer)
-        elif any(h in name for h in ['h1', 'h2', 'h3', 'h4', '装', '服']):
-            groups['服装'].append(layer)
-        else:
-            groups['其他'].append(layer)
+        buckets[_layer_bucket_rank(layer['name'])].append(layer)
+    
+    groups = dict(zip(_LAYER_GROUPS, buckets))
     
     # 移除空分组
     return {k: v for k, v in groups.items() if v}
 
 
+class _PixmapCache:
+    """高质量转换结果的有界 LRU 缓存
+    
+    PIL 图像不可哈希，以 (id(图像), 尺寸, 缩放比例) 为键；条目中只持有源图像的弱引用，
+    命中时再用 is 校验，避免 id 被复用后误命中；源图像被回收时对应条目随之移除，
+    缓存不会延长图层图像的生命周期。同时限制条目数与像素总字节数。
+    """
+    
+    def __init__(self, max_entries: int = 256, max_bytes: int = 128 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (源图像弱引用, QPixmap, 字节数)
+        self._total_bytes = 0
+    
+    def get(self, pil_image, scale_factor):
+        """查找缓存的QPixmap，未命中返回None"""
+        key = (id(pil_image), pil_image.size, scale_factor)
+        entry = self._entries.get(key)
+        if entry is None or entry[0]() is not pil_image:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def put(self, pil_image, scale_factor, pixmap):
+        """加入缓存，超出容量时淘汰最久未使用的条目"""
+        nbytes = pixmap.width() * pixmap.height() * 4
+        if nbytes > self.max_bytes:
+            return
+        
+        key = (id(pil_image), pil_image.size, scale_factor)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._total_bytes -= old[2]
+        
+        source_ref = weakref.ref(pil_image, lambda ref, key=key: self._discard(key, ref))
+        self._entries[key] = (source_ref, pixmap, nbytes)
+        self._total_bytes += nbytes
+        
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_bytes
+    
+    def _discard(self, key, source_ref):
+        """源图像被回收时移除其条目（条目已被同一键的新图像替换时保留）"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is source_ref:
+            del self._entries[key]
+            self._total_bytes -= entry[2]
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._total_bytes = 0
+
+
+_hq_pixmap_cache = _PixmapCache()
+
+# 按尺寸复用的 QImage 缓冲区（OpenCV 缩放路径直接写入其中），只保留最近使用的几种尺寸
+_QIMAGE_POOL_SIZE = 8
+_qimage_pool = OrderedDict()
+
+
+def _pooled_qimage(width, height, image_format):
+    """获取可复用的指定尺寸QImage，超出池容量时丢弃最久未使用的尺寸"""
+    key = (width, height, image_format)
+    qimage = _qimage_pool.pop(key, None)
+    if qimage is None:
+        qimage = QImage(width, height, image_format)
+    _qimage_pool[key] = qimage
+    if len(_qimage_pool) > _QIMAGE_POOL_SIZE:
+        _qimage_pool.popitem(last=False)
+    return qimage
+
+
+# QPainter 光栅引擎原生使用预乘的 ARGB32，交给它的 QImage 统一采用该格式以免绘制时再转换；
+# Format_ARGB32_Premultiplied 在小端机器上按 B,G,R,A 存储，大端机器退回到 RGBA8888 的预乘格式
+if sys.byteorder == 'little':
+    _PREMULTIPLIED_RAWMODE = 'BGRa'
+    PREMULTIPLIED_FORMAT = QImage.Format.Format_ARGB32_Premultiplied
+else:
+    _PREMULTIPLIED_RAWMODE = 'RGBa'
+    PREMULTIPLIED_FORMAT = QImage.Format.Format_RGBA8888_Premultiplied
+
+
+def pil_to_qimage(pil_image):
+    """将PIL图像转换为预乘透明度的QImage"""
+    if pil_image.mode not in ('RGBA', 'RGBa'):
+        pil_image = pil_image.convert('RGBA')
+    if _PREMULTIPLIED_RAWMODE == 'RGBa' and pil_image.mode == 'RGBA':
+        # Pillow 没有 RGBA -> RGBa 的打包器，需先转换模式
+        pil_image = pil_image.convert('RGBa')
+    
+    # 小端机器上 RGBA -> BGRa 在打包时一并完成预乘和通道重排
+    data = pil_image.tobytes('raw', _PREMULTIPLIED_RAWMODE)
+    width, height = pil_image.size
+    
+    # 格式与光栅引擎一致时 QPixmap.fromImage 会直接共享像素而不转换，
+    # copy() 使QImage拥有自己的像素数据，不再依赖 data 的生命周期
+    return QImage(data, width, height, width * 4, PREMULTIPLIED_FORMAT).copy()
+
+
 def pil_to_qpixmap_high_quality(pil_image, scale_factor: float = 1.0):
     """高质量PIL图像转QPixmap - 优化版本"""
+    # 大倍率放大的结果体积很大，不进入缓存
+    cacheable = scale_factor <= 2.0
+    if cacheable:
+        cached = _hq_pixmap_cache.get(pil_image, scale_factor)
+        if cached is not None:
+            return cached
+    
     try:
+        source = pil_image
+        
         # 确保RGBA模式
         if pil_image.mode != 'RGBA':
             pil_image = pil_image.convert('RGBA')
         
         # 如果需要缩放，使用最高质量算法
-        if scale_factor != 1.0:
-            new_width = int(pil_image.size[0] * scale_factor)
-            new_height = int(pil_image.size[1] * scale_factor)
+        new_width = int(pil_image.size[0] * scale_factor)
+        new_height = int(pil_image.size[1] * scale_factor)
+        
+        if scale_factor != 1.0 and _USE_CV2_RESIZE:
+            # OpenCV 不区分透明通道，先转为预乘的 RGBa，避免透明边缘出现色边；
+            # 放大使用 LANCZOS4，缩小使用 INTER_AREA（缩小时比 BICUBIC 更准确也更快）
+            interpolation = cv2.INTER_LANCZOS4 if scale_factor > 1.0 else cv2.INTER_AREA
             
+            # 缩放结果直接写入复用的 QImage 缓冲区，省去结果数组的分配与拷贝
+            # （bits() 会在缓冲区仍被共享时先分离，写入不会影响已生成的QPixmap）
+            qimage = _pooled_qimage(new_width, new_height, QImage.Format.Format_RGBA8888_Premultiplied)
+            bits = qimage.bits()
+            bits.setsize(qimage.sizeInBytes())
+            target = np.frombuffer(bits, dtype=np.uint8).reshape(new_height, new_width, 4)
+            cv2.resize(np.asarray(pil_image.convert('RGBa')), (new_width, new_height),
+                       dst=target, interpolation=interpolation)
+        else:
             # 对于放大使用LANCZOS，对于缩小使用不同算法以获得最佳效果
             if scale_factor > 1.0:
                 # 放大 - 使用LANCZOS获得平滑结果
                 pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            else:
+            elif scale_factor < 1.0:
                 # 缩小 - 使用BICUBIC获得锐利结果
                 pil_image = pil_image.resize((new_width, new_height), Image.Resampling.BICUBIC)
+            
+            # 转换为预乘格式的QImage
+            qimage = pil_to_qimage(pil_image)
         
-        # 转换为QPixmap
-        data = pil_image.tobytes('raw', 'RGBA')
-        width, height = pil_image.size
-        
-        # 创建QImage时使用最佳格式
-        qimage = QImage(data, width, height, QImage.Format.Format_RGBA8888)
-        
-        # 转换为QPixmap时启用最高质量变换
+        # fromImage 会复制像素，之后缓冲区即可释放
         pixmap = QPixmap.fromImage(qimage)
         
+        if cacheable:
+            _hq_pixmap_cache.put(source, scale_factor, pixmap)
         return pixmap
         
     except Exception as e:
@@ -411,6 +269,15 @@ def pil_to_qpixmap_high_quality(pil_image, scale_factor: float = 1.0):
         return None
 
 
+# 图层类型检测正则，按 眼 → 口 → 眉 的原有优先级在位置 0 依次尝试
+_DETECT_RE = re.compile(
+    r"(?=.*(?:眼|eye))(?P<eyes>)"
+    r"|(?=.*(?:口|mouth))(?P<mouth>)"
+    r"|(?=.*(?:眉|brow))(?P<eyebrows>)",
+    re.I | re.S
+)
+
+
 class SimpleAlignmentSystem:
     """简单的对齐系统占位类"""
     
@@ -420,14 +287,8 @@ class SimpleAlignmentSystem:
     def detect_layer_type(self, file_path, layer_name):
         """检测图层类型"""
         # 简单的类型检测逻辑
-        if "眼" in layer_name or "eye" in layer_name.lower():
-            return "eyes"
-        elif "口" in layer_name or "mouth" in layer_name.lower():
-            return "mouth"
-        elif "眉" in layer_name or "brow" in layer_name.lower():
-            return "eyebrows"
-        else:
-            return "other"
+        m = _DETECT_RE.match(layer_name)
+        return m.lastgroup if m else "other"
     
     def get_alignment_position(self, character_name, character_size, layer_type):
         """获取对齐位置"""
@@ -443,6 +304,7 @@ class SimpleAlignmentSystem:
         return "default"
 
 
+@functools.cache
 def get_alignment_system(base_path):
-    """获取对齐系统（占位实现）"""
+    """获取对齐系统（占位实现），同一路径只创建一次"""
     return SimpleAlignmentSystem()
@@ -4,7 +4,162 @@
 位置对齐系统 - 根据导入部件类型自动对齐到合适位置
 """
 
-from typing import Dict, List, Tuple, Optional
+import re
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, List, Tuple, Optional, Union
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+_ANALYSIS_TYPES = ('costume', 'expression', 'accessory', 'other')
+
+
+class _KeywordClassifier:
+    """按优先级排列的关键词表分类器
+    
+    tables 为 [(结果, [关键词, ...]), ...]，返回第一个有关键词命中的表对应的结果，
+    与原先 if/elif + any(keyword in name ...) 的判断顺序一致。
+    安装了 pyahocorasick 时一次扫描匹配全部关键词，否则每张表预编译为一个正则。
+    """
+    
+    def __init__(self, tables, default=None):
+        self.default = default
+        self._automaton = None
+        self._patterns = []
+        
+        if AHOCORASICK_AVAILABLE:
+            automaton = ahocorasick.Automaton()
+            for rank, (result, keywords) in enumerate(tables):
+                for keyword in keywords:
+                    # 同一关键词出现在多张表中时保留优先级最高的
+                    if keyword not in automaton:
+                        automaton.add_word(keyword, (rank, result))
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            self._patterns = [
+                (re.compile('|'.join(map(re.escape, keywords))), result)
+                for result, keywords in tables
+            ]
+    
+    def classify(self, text: str):
+        """返回文本所属分类，无命中时返回默认值"""
+        if self._automaton is not None:
+            best_rank, best = None, self.default
+            for _, (rank, result) in self._automaton.iter(text):
+                if best_rank is None or rank < best_rank:
+                    best_rank, best = rank, result
+                    if rank == 0:
+                        break
+            return best
+        
+        for pattern, result in self._patterns:
+            if pattern.search(text):
+                return result
+        return self.default
+
+
+# 各类型部件的位置区域关键词
+_ZONE_CLASSIFIERS = {
+    'costume': _KeywordClassifier([
+        ('head', ['帽', '头', 'hat', 'head']),
+        ('face', ['面', '脸', 'face', 'mask']),
+        ('chest', ['胸', 'chest', 'top']),
+        ('waist', ['腰', 'waist', 'belt']),
+        ('legs', ['腿', 'leg', 'pants', 'skirt']),
+    ], 'body'),
+    'expression': _KeywordClassifier([
+        ('eyes', ['眼', 'eye']),
+        ('eyebrows', ['眉', 'brow']),
+        ('mouth', ['嘴', 'mouth', 'lip']),
+        ('cheeks', ['脸', 'cheek']),
+    ], 'face'),
+    'accessory': _KeywordClassifier([
+        ('hair', ['发', 'hair']),
+        ('ear', ['耳', 'ear']),
+        ('neck', ['颈', 'neck']),
+        ('hand', ['手', 'hand']),
+        ('wrist', ['腕', 'wrist']),
+        ('back', ['背', 'back']),
+    ], 'default'),
+}
+
+# 左右 / 上下偏移关键词
+_OFFSET_X_CLASSIFIER = _KeywordClassifier([
+    (-20, ['左', 'left', 'l_']),
+    (20, ['右', 'right', 'r_']),
+], 0)
+_OFFSET_Y_CLASSIFIER = _KeywordClassifier([
+    (-10, ['上', 'upper', 'top']),
+    (10, ['下', 'lower', 'bottom']),
+], 0)
+
+# 导入部件类型关键词
+_TYPE_CLASSIFIER = _KeywordClassifier([
+    ('costume', [
+        '服装', '衣服', '上衣', '下装', '裙子', '裤子', '外套', '内衣',
+        'costume', 'clothes', 'dress', 'shirt', 'pants', 'coat'
+    ]),
+    ('expression', [
+        '表情', '眼睛', '眉毛', '嘴巴', '笑容', '哭泣', '愤怒',
+        'expression', 'eyes', 'eyebrows', 'mouth', 'smile', 'cry'
+    ]),
+    ('accessory', [
+        '配饰', '装饰', '帽子', '耳环', '项链', '手镯', '发饰',
+        'accessory', 'decoration', 'hat', 'earring', 'necklace', 'bracelet'
+    ]),
+])
+
+# 角色原始图层分类关键词
+_LAYER_CATEGORY_CLASSIFIER = _KeywordClassifier([
+    ('costume', ['服', '衣', '裙', '裤', '袖', '领']),
+    ('expression', ['眼', '眉', '嘴', '笑', '哭', '怒', '表情']),
+    ('accessory', ['饰', '带', '环', '链', '帽', '花']),
+], 'other')
+
+
+# 以下名称启发式均为纯函数，批量导入时同名图层会反复出现，
+# 因此在模块级以小写名称为键做缓存（方法中的 self 不适合作为缓存键）
+
+@lru_cache(maxsize=None)
+def _classify_layer_name(name_lower: str) -> str:
+    """将角色原始图层的小写名称归类为 costume / expression / accessory / other
+    
+    同系列素材的图层命名高度重复，不限制缓存大小，每个名称只分类一次
+    """
+    return _LAYER_CATEGORY_CLASSIFIER.classify(name_lower)
+
+
+@lru_cache(maxsize=4096)
+def _infer_zone(name_lower: str, layer_type: str) -> str:
+    """根据小写图层名称推断位置区域"""
+    classifier = _ZONE_CLASSIFIERS.get(layer_type)
+    if classifier is None:
+        return 'default'
+    return classifier.classify(name_lower)
+
+
+@lru_cache(maxsize=4096)
+def _name_based_offset(name_lower: str) -> Tuple[int, int]:
+    """根据小写图层名称获取额外偏移"""
+    return (_OFFSET_X_CLASSIFIER.classify(name_lower),
+            _OFFSET_Y_CLASSIFIER.classify(name_lower))
+
+
+@lru_cache(maxsize=4096)
+def _suggest_type_from_name(name_lower: str) -> Optional[str]:
+    """根据小写图层名称中的关键词建议图层类型，无法判断时返回 None"""
+    return _TYPE_CLASSIFIER.classify(name_lower)
 
 
 class PositionAlignmentSystem:
@@ -59,12 +214,28 @@ class PositionAlignmentSystem:
         }
     }
     
+    # 扁平化的区域查找表，(部件类型, 区域) -> 偏移；POSITION_ZONES 变化时同步更新
+    _FLAT_ZONES = {(layer_type, zone): pos
+                   for layer_type, zones in POSITION_ZONES.items()
+                   for zone, pos in zones.items()}
+    _DEFAULTS = {layer_type: zones['default'] for layer_type, zones in POSITION_ZONES.items()}
+    
     def __init__(self):
         self.learned_positions: Dict[str, Dict[str, Tuple[int, int]]] = {}
         self.character_analysis_cache: Dict[str, Dict] = {}
+        # 各类型图层位置的累计值 (sum_x, sum_y, count)，与 character_analysis_cache 使用相同的键
+        self._type_sums: Dict[str, Dict[str, Tuple[int, int, int]]] = {}
+        # 尚未生效的位置学习数据 (layer_type, zone, position, character_name)
+        self._pending_learn: List[Tuple] = []
     
-    def analyzeCharacterLayers(self, character_data: Dict, character_name: str, size: str) -> Dict[str, List[Tuple[int, int]]]:
-        """分析角色原始图层，提取各类型部件的典型位置"""
+    def analyzeCharacterLayers(self, character_data: Dict, character_name: str,
+                               size: str) -> Dict[str, Union[List[Tuple[int, int]], "np.ndarray"]]:
+        """分析角色原始图层，提取各类型部件的典型位置
+        
+        安装了 numpy 时各类型的位置为 N×2 的 int32 数组，否则为位置列表
+        （通过 importAlignmentConfig 导入的缓存也是列表）。数组不能直接用于真值判断，
+        判断是否为空请使用 len(positions)。
+        """
         if character_name not in character_data:
             return {}
         
@@ -74,38 +245,75 @@ class PositionAlignmentSystem:
         
         char_data = character_data[character_name]
         size_data = char_data['layer_mapping'].get(size, {})
+        type_positions = self._classifyLayerPositions(size_data)
         
+        self.character_analysis_cache[cache_key] = type_positions
+        self._type_sums[cache_key] = self._computeTypeSums(type_positions)
+        return type_positions
+    
+    def _classifyLayerPositions(self, size_data: Dict) -> Dict:
+        """按图层名称将图层位置归类"""
         # 分析结果
-        type_positions = {
-            'costume': [],
-            'expression': [],
-            'accessory': [],
-            'other': []
-        }
+        type_positions = {layer_type: [] for layer_type in _ANALYSIS_TYPES}
         
-        # 收集所有图层
-        all_layers = []
-        for group_name, group_layers in size_data.items():
-            all_layers.extend(group_layers)
+        # 根据图层名称关键词分类（直接遍历所有分组中的图层）
+        for layer in chain.from_iterable(size_data.values()):
+            type_positions[_classify_layer_name(layer['name'].lower())].append(layer['position'])
         
-        # 根据图层名称和位置分类
-        for layer in all_layers:
-            layer_name = layer['name'].lower()
-            position = layer['position']
-            
-            # 根据名称关键词分类
-            if any(keyword in layer_name for keyword in ['服', '衣', '裙', '裤', '袖', '领']):
-                type_positions['costume'].append(position)
-            elif any(keyword in layer_name for keyword in ['眼', '眉', '嘴', '笑', '哭', '怒', '表情']):
-                type_positions['expression'].append(position)
-            elif any(keyword in layer_name for keyword in ['饰', '带', '环', '链', '帽', '花']):
-                type_positions['accessory'].append(position)
-            else:
-                type_positions['other'].append(position)
+        if NUMPY_AVAILABLE:
+            # 以 N×2 数组保存，便于向量化计算
+            type_positions = {
+                layer_type: np.asarray(positions, dtype=np.int32).reshape(-1, 2)
+                for layer_type, positions in type_positions.items()
+            }
         
-        self.character_analysis_cache[cache_key] = type_positions
         return type_positions
     
+    def _computeTypeSums(self, type_positions: Dict) -> Dict[str, Tuple[int, int, int]]:
+        """计算各类型图层位置的累计值 (sum_x, sum_y, count)"""
+        sums = {}
+        for layer_type, positions in type_positions.items():
+            count = len(positions)
+            if not count:
+                continue
+            if NUMPY_AVAILABLE:
+                totals = np.asarray(positions, dtype=np.int64).reshape(-1, 2).sum(axis=0)
+                sums[layer_type] = (int(totals[0]), int(totals[1]), count)
+            else:
+                sums[layer_type] = (sum(pos[0] for pos in positions),
+                                    sum(pos[1] for pos in positions), count)
+        return sums
+    
+    def _getTypeSums(self, cache_key: str) -> Dict[str, Tuple[int, int, int]]:
+        """获取缓存的位置累计值，缺失时（如导入的缓存）按需计算"""
+        sums = self._type_sums.get(cache_key)
+        if sums is None:
+            sums = self._computeTypeSums(self.character_analysis_cache.get(cache_key, {}))
+            self._type_sums[cache_key] = sums
+        return sums
+    
+    def addLayerPosition(self, character_name: str, size: str, layer_type: str, position: Tuple[int, int]):
+        """向已分析的角色追加一个图层位置，平均位置随之以 O(1) 更新"""
+        cache_key = f"{character_name}_{size}"
+        type_positions = self.character_analysis_cache.get(cache_key)
+        if type_positions is None:
+            return
+        
+        positions = type_positions.get(layer_type)
+        if positions is None:
+            positions = []
+        if NUMPY_AVAILABLE:
+            type_positions[layer_type] = np.append(
+                np.asarray(positions, dtype=np.int32).reshape(-1, 2), [position], axis=0
+            ).astype(np.int32)
+        else:
+            positions.append(position)
+            type_positions[layer_type] = positions
+        
+        sums = self._getTypeSums(cache_key)
+        sum_x, sum_y, count = sums.get(layer_type, (0, 0, 0))
+        sums[layer_type] = (sum_x + position[0], sum_y + position[1], count + 1)
+    
     def calculateOptimalPosition(self, 
                                layer_type: str, 
                                image_size: Tuple[int, int],
@@ -127,15 +335,18 @@ class PositionAlignmentSystem:
         Returns:
             (x, y) 位置坐标
         """
+        # 先应用尚未生效的位置学习数据
+        self.flushLearning()
+        
         # 如果有角色数据，使用智能分析
         if character_data and character_name and size:
-            analyzed_positions = self.analyzeCharacterLayers(character_data, character_name, size)
+            self.analyzeCharacterLayers(character_data, character_name, size)
+            type_sums = self._getTypeSums(f"{character_name}_{size}")
             
-            if layer_type in analyzed_positions and analyzed_positions[layer_type]:
-                positions = analyzed_positions[layer_type]
-                # 计算该类型图层的平均位置
-                avg_x = sum(pos[0] for pos in positions) // len(positions)
-                avg_y = sum(pos[1] for pos in positions) // len(positions)
+            if layer_type in type_sums:
+                # 由累计值得到该类型图层的平均位置
+                sum_x, sum_y, count = type_sums[layer_type]
+                avg_x, avg_y = sum_x // count, sum_y // count
                 
                 # 根据图层名称进行微调
                 offset_x, offset_y = self._getNameBasedOffset(layer_name or "", layer_type)
@@ -144,8 +355,7 @@ class PositionAlignmentSystem:
         
         # 使用基础位置区域映射
         zone_key = self._inferZoneFromName(layer_name or "", layer_type)
-        base_offset = self.POSITION_ZONES[layer_type].get(zone_key, 
-                                                         self.POSITION_ZONES[layer_type]['default'])
+        base_offset = self._FLAT_ZONES.get((layer_type, zone_key), self._DEFAULTS[layer_type])
         
         # 根据图像尺寸调整位置（居中对齐）
         img_width, img_height = image_size
@@ -158,103 +368,22 @@ class PositionAlignmentSystem:
         """根据图层名称推断位置区域"""
         if not layer_name:
             return 'default'
-        
-        name_lower = layer_name.lower()
-        
-        if layer_type == 'costume':
-            if any(keyword in name_lower for keyword in ['帽', '头', 'hat', 'head']):
-                return 'head'
-            elif any(keyword in name_lower for keyword in ['面', '脸', 'face', 'mask']):
-                return 'face'
-            elif any(keyword in name_lower for keyword in ['胸', 'chest', 'top']):
-                return 'chest'
-            elif any(keyword in name_lower for keyword in ['腰', 'waist', 'belt']):
-                return 'waist'
-            elif any(keyword in name_lower for keyword in ['腿', 'leg', 'pants', 'skirt']):
-                return 'legs'
-            else:
-                return 'body'
-        
-        elif layer_type == 'expression':
-            if any(keyword in name_lower for keyword in ['眼', 'eye']):
-                return 'eyes'
-            elif any(keyword in name_lower for keyword in ['眉', 'brow']):
-                return 'eyebrows'
-            elif any(keyword in name_lower for keyword in ['嘴', 'mouth', 'lip']):
-                return 'mouth'
-            elif any(keyword in name_lower for keyword in ['脸', 'cheek']):
-                return 'cheeks'
-            else:
-                return 'face'
-        
-        elif layer_type == 'accessory':
-            if any(keyword in name_lower for keyword in ['发', 'hair']):
-                return 'hair'
-            elif any(keyword in name_lower for keyword in ['耳', 'ear']):
-                return 'ear'
-            elif any(keyword in name_lower for keyword in ['颈', 'neck']):
-                return 'neck'
-            elif any(keyword in name_lower for keyword in ['手', 'hand']):
-                return 'hand'
-            elif any(keyword in name_lower for keyword in ['腕', 'wrist']):
-                return 'wrist'
-            elif any(keyword in name_lower for keyword in ['背', 'back']):
-                return 'back'
-            else:
-                return 'default'
-        
-        return 'default'
+        return _infer_zone(layer_name.lower(), layer_type)
     
     def _getNameBasedOffset(self, layer_name: str, layer_type: str) -> Tuple[int, int]:
         """根据图层名称获取额外偏移"""
         if not layer_name:
             return (0, 0)
-        
-        name_lower = layer_name.lower()
-        
-        # 左右偏移判断
-        offset_x = 0
-        if any(keyword in name_lower for keyword in ['左', 'left', 'l_']):
-            offset_x = -20
-        elif any(keyword in name_lower for keyword in ['右', 'right', 'r_']):
-            offset_x = 20
-        
-        # 上下偏移判断
-        offset_y = 0
-        if any(keyword in name_lower for keyword in ['上', 'upper', 'top']):
-            offset_y = -10
-        elif any(keyword in name_lower for keyword in ['下', 'lower', 'bottom']):
-            offset_y = 10
-        
-        return (offset_x, offset_y)
+        return _name_based_offset(layer_name.lower())
     
     def suggestLayerType(self, layer_name: str, image_size: Tuple[int, int]) -> str:
         """根据图层名称和图像特征建议图层类型"""
         if not layer_name:
             return 'custom'
         
-        name_lower = layer_name.lower()
-        
-        # 服装关键词
-        if any(keyword in name_lower for keyword in [
-            '服装', '衣服', '上衣', '下装', '裙子', '裤子', '外套', '内衣',
-            'costume', 'clothes', 'dress', 'shirt', 'pants', 'coat'
-        ]):
-            return 'costume'
-        
-        # 表情关键词
-        if any(keyword in name_lower for keyword in [
-            '表情', '眼睛', '眉毛', '嘴巴', '笑容', '哭泣', '愤怒',
-            'expression', 'eyes', 'eyebrows', 'mouth', 'smile', 'cry'
-        ]):
-            return 'expression'
-        
-        # 配饰关键词
-        if any(keyword in name_lower for keyword in [
-            '配饰', '装饰', '帽子', '耳环', '项链', '手镯', '发饰',
-            'accessory', 'decoration', 'hat', 'earring', 'necklace', 'bracelet'
-        ]):
-            return 'accessory'
+        layer_type = _suggest_type_from_name(layer_name.lower())
+        if layer_type:
+            return layer_type
         
         # 根据图像尺寸推测
         width, height = image_size
@@ -275,6 +404,7 @@ class PositionAlignmentSystem:
     
     def getAlignmentPresets(self, layer_type: str) -> Dict[str, Tuple[int, int]]:
         """获取指定类型的对齐预设"""
+        self.flushLearning()
         return self.POSITION_ZONES.get(layer_type, {})
     
     def learnFromUserPlacement(self, 
@@ -282,38 +412,88 @@ class PositionAlignmentSystem:
                              zone: str, 
                              position: Tuple[int, int],
                              character_name: Optional[str] = None):
-        """从用户的位置调整中学习"""
-        if character_name:
-            if character_name not in self.learned_positions:
-                self.learned_positions[character_name] = {}
+        """从用户的位置调整中学习
+        
+        位置先缓存起来，在调用 flushLearning 时统一生效；calculateOptimalPosition、
+        getAlignmentPresets 与 exportAlignmentConfig 在查询前会自动调用 flushLearning，
+        因此学习结果总能在下一次查询中体现。
+        """
+        self._pending_learn.append((layer_type, zone, position, character_name))
+    
+    def flushLearning(self):
+        """应用缓存的位置学习数据，可在用户放下部件（鼠标释放）时调用，查询方法也会自动调用
+        
+        拖动过程中的大量中间位置只按其平均值对每个 (类型, 区域) 的预设做一次加权更新，
+        避免预设被拖动途中的临时位置反复牵引。
+        """
+        if not self._pending_learn:
+            return
+        
+        pending, self._pending_learn = self._pending_learn, []
+        zone_totals = {}
+        
+        for layer_type, zone, position, character_name in pending:
+            if character_name:
+                if character_name not in self.learned_positions:
+                    self.learned_positions[character_name] = {}
+                
+                key = f"{layer_type}_{zone}"
+                self.learned_positions[character_name][key] = position
             
-            key = f"{layer_type}_{zone}"
-            self.learned_positions[character_name][key] = position
+            # 累计同一区域的位置，用于更新全局预设
+            if layer_type in self.POSITION_ZONES and zone in self.POSITION_ZONES[layer_type]:
+                sum_x, sum_y, count = zone_totals.get((layer_type, zone), (0, 0, 0))
+                zone_totals[(layer_type, zone)] = (sum_x + position[0], sum_y + position[1], count + 1)
         
-        # 也可以更新全局预设
-        if layer_type in self.POSITION_ZONES and zone in self.POSITION_ZONES[layer_type]:
+        for (layer_type, zone), (sum_x, sum_y, count) in zone_totals.items():
             # 采用加权平均的方式逐步调整预设
             current_pos = self.POSITION_ZONES[layer_type][zone]
-            new_x = int(current_pos[0] * 0.8 + position[0] * 0.2)
-            new_y = int(current_pos[1] * 0.8 + position[1] * 0.2)
+            new_x = int(current_pos[0] * 0.8 + sum_x / count * 0.2)
+            new_y = int(current_pos[1] * 0.8 + sum_y / count * 0.2)
             self.POSITION_ZONES[layer_type][zone] = (new_x, new_y)
+            self._FLAT_ZONES[(layer_type, zone)] = (new_x, new_y)
+            if zone == 'default':
+                self._DEFAULTS[layer_type] = (new_x, new_y)
+    
+    def _rebuildZoneLookup(self):
+        """根据 POSITION_ZONES 重建扁平化的区域查找表"""
+        self._FLAT_ZONES.clear()
+        self._DEFAULTS.clear()
+        for layer_type, zones in self.POSITION_ZONES.items():
+            for zone, pos in zones.items():
+                self._FLAT_ZONES[(layer_type, zone)] = tuple(pos)
+            if 'default' in zones:
+                self._DEFAULTS[layer_type] = tuple(zones['default'])
     
     def exportAlignmentConfig(self) -> Dict:
         """导出对齐配置（用于保存用户学习的位置偏好）"""
+        self.flushLearning()
+        cache = {
+            cache_key: {
+                layer_type: [list(map(int, pos)) for pos in positions]
+                for layer_type, positions in type_positions.items()
+            }
+            for cache_key, type_positions in self.character_analysis_cache.items()
+        }
         return {
             'position_zones': self.POSITION_ZONES,
             'learned_positions': self.learned_positions,
-            'cache': self.character_analysis_cache
+            'cache': cache
         }
     
     def importAlignmentConfig(self, config: Dict):
         """导入对齐配置"""
+        # 导入前先应用缓存的学习数据，避免其之后叠加到导入的预设上
+        self.flushLearning()
         if 'position_zones' in config:
             self.POSITION_ZONES.update(config['position_zones'])
+            self._rebuildZoneLookup()
         if 'learned_positions' in config:
             self.learned_positions.update(config['learned_positions'])
         if 'cache' in config:
             self.character_analysis_cache.update(config['cache'])
+            for cache_key in config['cache']:
+                self._type_sums.pop(cache_key, None)
 
 
 # 全局对齐系统实例
@@ -5,14 +5,22 @@
 包含预览窗口、可预览的复选框和背景项目等控件
 """
 
+import functools
+import hashlib
 import os
+from collections import OrderedDict
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, 
     QCheckBox, QFrame, QApplication
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QRect
-from PyQt6.QtGui import QFont, QPixmap, QImage
+from PyQt6.QtCore import (
+    Qt, pyqtSignal, QPoint, QRect, QSize, QRunnable, QThreadPool,
+    QSaveFile, QIODevice, QStandardPaths
+)
+from PyQt6.QtGui import QFont, QPixmap, QPixmapCache, QImage, QImageReader, QImageIOHandler
+
+from ..utils import PREMULTIPLIED_FORMAT, pil_to_qimage
 
 try:
     from PIL import Image
@@ -21,8 +29,195 @@ except ImportError:
     PIL_AVAILABLE = False
 
 
+# 预览缩略图的磁盘缓存，避免每次悬停都重新解码原图
+THUMBNAIL_CACHE_LIMIT = 128 * 1024 * 1024
+PREVIEW_MAX_SIZE = (270, 280)
+# 内存中记录的预览原图尺寸条数上限
+PREVIEW_SOURCE_SIZE_LIMIT = 1024
+
+
+def _preview_cache_key(image_path):
+    """由原图路径、修改时间和预览尺寸组成的缓存键，原图修改后自动失效"""
+    max_width, max_height = PREVIEW_MAX_SIZE
+    return f"{image_path}:{os.path.getmtime(image_path)}:{max_width}x{max_height}"
+
+
+@functools.cache
+def thumbnail_cache_dir():
+    """缩略图磁盘缓存目录，位于系统缓存位置下，依赖应用名称，需在创建 QApplication 后调用"""
+    cache_root = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+    return Path(cache_root) / "thumbs"
+
+
+def _thumbnail_cache_path(image_path):
+    """计算缩略图在磁盘缓存中的路径"""
+    key = hashlib.blake2b(_preview_cache_key(image_path).encode('utf-8'), digest_size=16).hexdigest()
+    return thumbnail_cache_dir() / f"{key}.png"
+
+
+def prune_thumbnail_cache(limit=THUMBNAIL_CACHE_LIMIT):
+    """按最近使用时间淘汰缩略图缓存，使总大小不超过 limit"""
+    entries = []
+    try:
+        for path in thumbnail_cache_dir().glob("*.png"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+    except OSError:
+        return
+    
+    total = sum(size for _, size, _ in entries)
+    entries.sort()
+    for _, size, path in entries:
+        if total <= limit:
+            break
+        try:
+            path.unlink()
+            total -= size
+        except OSError as e:
+            print(f"清理缩略图缓存失败: {e}")
+
+
+@functools.cache
+def _qt_image_formats():
+    """Qt图像插件能够解码的格式（小写扩展名）"""
+    return frozenset(bytes(fmt).decode('ascii').lower() for fmt in QImageReader.supportedImageFormats())
+
+
+def _load_qimage_with_pil(image_path):
+    """使用PIL解码Qt不支持的图像格式，PIL不可用时返回None"""
+    if not PIL_AVAILABLE:
+        return None
+    
+    with Image.open(image_path) as pil_image:
+        return pil_to_qimage(pil_image)
+
+
+def _read_scaled_qimage(image_path, max_width, max_height):
+    """用QImageReader解码并在解码时缩小到预览尺寸，返回 (图像, 原图尺寸)
+    
+    JPEG等格式可直接按目标尺寸解码，不必分配原尺寸的图像；其余格式由QImageReader读取后平滑缩放
+    """
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    
+    raw_size = reader.size()
+    if not raw_size.isValid():
+        return reader.read(), QSize()
+    
+    # EXIF旋转90度时，显示尺寸与存储尺寸宽高互换
+    source = raw_size
+    if reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90:
+        source = raw_size.transposed()
+    
+    scale = min(max_width / source.width(), max_height / source.height(), 1.0)
+    if scale < 1.0:
+        reader.setScaledSize(QSize(max(1, int(raw_size.width() * scale)),
+                                   max(1, int(raw_size.height() * scale))))
+    return reader.read(), source
+
+
+def load_preview_thumbnail(image_path):
+    """加载预览图像，优先使用磁盘缩略图缓存，返回 (图像, 原图尺寸文本)
+    
+    只使用QImage，可在工作线程中调用
+    """
+    cache_path = _thumbnail_cache_path(image_path)
+    qimage = QImage(str(cache_path))
+    if not qimage.isNull():
+        try:
+            os.utime(cache_path)  # 刷新最近使用时间，供淘汰时参考
+        except OSError:
+            pass
+        return qimage, qimage.text("source-size")
+    
+    max_width, max_height = PREVIEW_MAX_SIZE
+    
+    # 由Qt解码，只有Qt不支持的格式才交给PIL
+    suffix = os.path.splitext(image_path)[1][1:].lower()
+    if suffix in _qt_image_formats() or not PIL_AVAILABLE:
+        qimage, source = _read_scaled_qimage(image_path, max_width, max_height)
+    else:
+        qimage = _load_qimage_with_pil(image_path)
+        source = QSize()
+    if qimage is None or qimage.isNull():
+        raise ValueError("无法解码图像")
+    if not source.isValid():
+        source = qimage.size()
+    
+    # 以光栅引擎原生的预乘格式缩放，透明边缘不会混入底色，缩放时也无需再转换
+    qimage = qimage.convertToFormat(PREMULTIPLIED_FORMAT)
+    
+    # 解码时未能缩小的图像（PIL解码或无法预先得知尺寸）在此缩放以适应预览窗口
+    scale = min(max_width / qimage.width(), max_height / qimage.height(), 1.0)
+    if scale < 1.0:
+        new_width = int(qimage.width() * scale)
+        new_height = int(qimage.height() * scale)
+        qimage = qimage.scaled(new_width, new_height,
+                               Qt.AspectRatioMode.KeepAspectRatio,
+                               Qt.TransformationMode.SmoothTransformation)
+    
+    # 原图尺寸写入PNG文本块，命中缓存时无需再读取原图
+    source_size = f"{source.width()}×{source.height()}"
+    qimage.setText("source-size", source_size)
+    _save_thumbnail(qimage, cache_path)
+    
+    return qimage, source_size
+
+
+def _save_thumbnail(qimage, cache_path):
+    """写入缩略图缓存，通过QSaveFile原子替换，避免读到写了一半的文件"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        print(f"保存预览缩略图失败: {e}")
+        return
+    
+    save_file = QSaveFile(str(cache_path))
+    if not save_file.open(QIODevice.OpenModeFlag.WriteOnly):
+        print(f"保存预览缩略图失败: {save_file.errorString()}")
+        return
+    if qimage.save(save_file, "PNG"):
+        save_file.commit()
+    else:
+        save_file.cancelWriting()
+        print(f"保存预览缩略图失败: {cache_path}")
+
+
+class ThumbnailPrefetch(QRunnable):
+    """后台生成预览缩略图缓存的任务，只读写磁盘缓存，不接触任何控件"""
+    def __init__(self, image_path, inflight):
+        super().__init__()
+        self.image_path = image_path
+        self.inflight = inflight
+    
+    def run(self):
+        try:
+            if not _thumbnail_cache_path(self.image_path).exists():
+                load_preview_thumbnail(self.image_path)
+        except Exception as e:
+            print(f"预取预览缩略图失败: {e}")
+        finally:
+            self.inflight.discard(self.image_path)
+
+
 class LayerPreviewWindow(QWidget):
     """图层预览窗口"""
+    # 样式表在类级别只构造一次，所有实例共用同一份字符串
+    _QSS = """
+        QWidget {
+            background-color: #2b2b2b;
+            border: 2px solid #007bff;
+            border-radius: 8px;
+        }
+        QLabel {
+            color: #ffffff;
+            background: transparent;
+            padding: 8px;
+        }
+    """
+    _IMAGE_QSS = "border: 1px solid #555555; background-color: #3c3c3c;"
+    _INFO_QSS = "font-size: 9px; color: #cccccc;"
+    
     def __init__(self):
         super().__init__()
         self.setWindowFlags(Qt.WindowType.ToolTip | Qt.WindowType.FramelessWindowHint)
@@ -30,18 +225,7 @@ class LayerPreviewWindow(QWidget):
         self.setFixedSize(300, 400)
         
         # 设置样式
-        self.setStyleSheet("""
-            QWidget {
-                background-color: #2b2b2b;
-                border: 2px solid #007bff;
-                border-radius: 8px;
-            }
-            QLabel {
-                color: #ffffff;
-                background: transparent;
-                padding: 8px;
-            }
-        """)
+        self.setStyleSheet(self._QSS)
         
         layout = QVBoxLayout(self)
         layout.setContentsMargins(8, 8, 8, 8)
@@ -56,14 +240,23 @@ class LayerPreviewWindow(QWidget):
         self.image_label = QLabel()
         self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.image_label.setMinimumSize(280, 300)
-        self.image_label.setStyleSheet("border: 1px solid #555555; background-color: #3c3c3c;")
+        self.image_label.setStyleSheet(self._IMAGE_QSS)
         layout.addWidget(self.image_label)
         
         # 信息标签
         self.info_label = QLabel()
         self.info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.info_label.setStyleSheet("font-size: 9px; color: #cccccc;")
+        self.info_label.setStyleSheet(self._INFO_QSS)
         layout.addWidget(self.info_label)
+        
+        # 预览缓存键 -> 原图尺寸文本（按最近预览排序的LRU），QPixmapCache 命中时用于显示信息
+        self._preview_source_sizes = OrderedDict()
+        
+        # 正在后台预取的图像路径，避免重复提交
+        self._prefetch_inflight = set()
+        
+        # 启动时清理超出上限的缩略图缓存
+        prune_thumbnail_cache()
     
     def showPreview(self, layer_name, image_path, layer_info=None):
         """显示图层预览"""
@@ -72,27 +265,18 @@ class LayerPreviewWindow(QWidget):
         # 加载并显示图像
         if os.path.exists(image_path):
             try:
-                # 使用PIL加载图像以支持更多格式
-                pil_image = Image.open(image_path)
-                if pil_image.mode != 'RGBA':
-                    pil_image = pil_image.convert('RGBA')
-                
-                # 计算缩放比例以适应预览窗口
-                img_width, img_height = pil_image.size
-                max_width, max_height = 270, 280
-                
-                scale = min(max_width / img_width, max_height / img_height, 1.0)
-                if scale < 1.0:
-                    new_width = int(img_width * scale)
-                    new_height = int(img_height * scale)
-                    pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                # 转换为QPixmap
-                data = pil_image.tobytes('raw', 'RGBA')
-                width, height = pil_image.size
-                qimage = QImage(data, width, height, QImage.Format.Format_RGBA8888)
-                pixmap = QPixmap.fromImage(qimage)
-                
+                # 内存中的QPixmapCache优先，其次是磁盘缩略图缓存
+                cache_key = f"preview:{_preview_cache_key(image_path)}"
+                pixmap = QPixmapCache.find(cache_key)
+                source_size = self._preview_source_sizes.pop(cache_key, None)
+                if pixmap is None or source_size is None:
+                    qimage, source_size = load_preview_thumbnail(image_path)
+                    pixmap = QPixmap.fromImage(qimage)
+                    QPixmapCache.insert(cache_key, pixmap)
+                # 重新插入到末尾，超出上限时丢弃最久未预览的条目
+                self._preview_source_sizes[cache_key] = source_size
+                if len(self._preview_source_sizes) > PREVIEW_SOURCE_SIZE_LIMIT:
+                    self._preview_source_sizes.popitem(last=False)
                 self.image_label.setPixmap(pixmap)
                 
                 # 设置信息文本
@@ -101,7 +285,7 @@ class LayerPreviewWindow(QWidget):
                     info_text += f"ID: {layer_info.get('layer_id', 'N/A')}"
                     self.info_label.setText(info_text)
                 else:
-                    self.info_label.setText(f"尺寸: {img_width}×{img_height}")
+                    self.info_label.setText(f"尺寸: {source_size}")
                 
             except Exception as e:
                 print(f"预览图像加载失败: {e}")
@@ -111,6 +295,15 @@ class LayerPreviewWindow(QWidget):
             self.image_label.setText("图像文件不存在")
             self.info_label.setText(f"路径: {image_path}")
     
+    def prefetchPreviews(self, image_paths):
+        """在全局线程池中预先生成这些图像的缩略图缓存"""
+        pool = QThreadPool.globalInstance()
+        for image_path in image_paths:
+            if image_path in self._prefetch_inflight or not os.path.exists(image_path):
+                continue
+            self._prefetch_inflight.add(image_path)
+            pool.start(ThumbnailPrefetch(image_path, self._prefetch_inflight))
+    
     def showAtPosition(self, global_pos):
         """在指定位置显示预览窗口"""
         # 获取屏幕尺寸
@@ -120,17 +313,15 @@ class LayerPreviewWindow(QWidget):
         else:
             screen_rect = QRect(0, 0, 1920, 1080)  # 默认尺寸
         
-        # 计算窗口位置，确保不超出屏幕边界
-        x = global_pos.x() + 20  # 鼠标右侧
+        # 计算窗口位置：优先放在鼠标右侧，放不下时放到左侧，避免遮住鼠标
+        x = global_pos.x() + 20
+        if x + self.width() > screen_rect.right():
+            x = global_pos.x() - self.width() - 20
         y = global_pos.y() - 200  # 鼠标上方
         
-        # 边界检查
-        if x + self.width() > screen_rect.right():
-            x = global_pos.x() - self.width() - 20  # 鼠标左侧
-        if y < screen_rect.top():
-            y = global_pos.y() + 20  # 鼠标下方
-        if y + self.height() > screen_rect.bottom():
-            y = screen_rect.bottom() - self.height()
+        # 限制在屏幕范围内
+        x = min(max(x, screen_rect.left()), screen_rect.right() - self.width())
+        y = min(max(y, screen_rect.top()), screen_rect.bottom() - self.height())
         
         self.move(x, y)
         self.show()
@@ -140,6 +331,7 @@ class LayerPreviewWindow(QWidget):
 class PreviewableCheckBox(QCheckBox):
     """支持预览的复选框"""
     previewRequested = pyqtSignal(object, QPoint)  # 发送图层信息和鼠标位置
+    previewLeft = pyqtSignal()  # 鼠标离开，预览窗口可以隐藏
     
     def __init__(self, text, layer_info=None):
         super().__init__(text)
@@ -156,13 +348,30 @@ class PreviewableCheckBox(QCheckBox):
     def leaveEvent(self, event):
         """鼠标离开事件"""
         super().leaveEvent(event)
-        # 预览窗口会通过定时器自动隐藏
+        # 预览窗口由主窗口的定时器延迟隐藏，移到相邻项目时直接复用
+        self.previewLeft.emit()
 
 
 class PreviewableBackgroundItem(QFrame):
     """支持预览的背景项目"""
     backgroundSelected = pyqtSignal(str)  # 发送背景文件名
     previewRequested = pyqtSignal(str, QPoint)  # 发送背景文件名和鼠标位置
+    previewLeft = pyqtSignal()  # 鼠标离开，预览窗口可以隐藏
+    
+    # 样式表在类级别只构造一次，所有实例共用同一份字符串
+    _QSS = """
+        QFrame {
+            border: 1px solid #555555;
+            border-radius: 4px;
+            background-color: #4a4a4a;
+            margin: 2px;
+        }
+        QFrame:hover {
+            border: 2px solid #007bff;
+            background-color: #3c3c3c;
+        }
+    """
+    _NAME_QSS = "color: #ffffff; font-weight: bold;"
     
     def __init__(self, bg_filename, bg_path):
         super().__init__()
@@ -184,24 +393,13 @@ class PreviewableBackgroundItem(QFrame):
         
         # 背景名称标签
         name_label = QLabel(self.bg_filename)
-        name_label.setStyleSheet("color: #ffffff; font-weight: bold;")
+        name_label.setStyleSheet(self._NAME_QSS)
         layout.addWidget(name_label)
         
         layout.addStretch()
         
         # 设置框架样式
-        self.setStyleSheet("""
-            QFrame {
-                border: 1px solid #555555;
-                border-radius: 4px;
-                background-color: #4a4a4a;
-                margin: 2px;
-            }
-            QFrame:hover {
-                border: 2px solid #007bff;
-                background-color: #3c3c3c;
-            }
-        """)
+        self.setStyleSheet(self._QSS)
     
     def enterEvent(self, event):
         """鼠标进入事件"""
@@ -212,4 +410,5 @@ class PreviewableBackgroundItem(QFrame):
     def leaveEvent(self, event):
         """鼠标离开事件"""
         super().leaveEvent(event)
-        # 预览窗口会通过定时器自动隐藏
+        # 预览窗口由主窗口的定时器延迟隐藏，移到相邻项目时直接复用
+        self.previewLeft.emit()
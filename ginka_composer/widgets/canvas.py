@@ -5,31 +5,60 @@
 包含高性能的画布组件，用于显示和操作角色
 """
 
+import bisect
+import itertools
+import math
 import os
+import weakref
+from operator import attrgetter
 from typing import Optional
 from PyQt6.QtWidgets import QWidget
-from PyQt6.QtCore import Qt, pyqtSignal, QPoint
+from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QRect, QRectF, QTimer
 from PyQt6.QtGui import (
     QPixmap, QPainter, QColor, QPen, QMouseEvent, 
-    QWheelEvent, QImage
+    QWheelEvent, QPixmapCache, QRegion
 )
 
+from ..utils import pil_to_qimage
+
 try:
     from PIL import Image
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
-class Canvas(QWidget):
-    """高性能画布组件"""
-    characterSelected = pyqtSignal(str)  # instance_id
-    characterTransformChanged = pyqtSignal(str)  # instance_id - 当角色变换改变时发出
+try:
+    from PyQt6.QtGui import QOpenGLContext
+    from PyQt6.QtOpenGLWidgets import QOpenGLWidget
+    OPENGL_AVAILABLE = True
+except ImportError:
+    OPENGL_AVAILABLE = False
+
+
+# 图层QPixmap在全局QPixmapCache中的键序号
+_pixmap_keys = itertools.count()
+
+
+class _CanvasMixin:
+    """画布的绘制与交互逻辑，由光栅绘制的 Canvas 和 OpenGL 绘制的 GLCanvas 共用
+    
+    本类不是 QObject：PyQt 只注册第一个 QObject 基类上声明的信号，
+    因此 characterSelected / characterTransformChanged 由各个具体控件类自行声明。
+    """
     
     def __init__(self):
         super().__init__()
         self.setMinimumSize(800, 600)
         self.background_pixmap = None
+        # 按缩放档位预先缩小的背景，避免每次重绘都从原图缩放
+        self._bg_scaled = None
+        self._bg_scaled_for = 0.0
         self.character_instances = {}
         self.scale_factor = 1.0
         self.offset_x = 0
@@ -37,36 +66,90 @@ class Canvas(QWidget):
         self.drag_start = None
         self.drag_mode = "canvas"  # "canvas" or "character"
         self.selected_instance = None
+        # 角色实例合成结果缓存：instance_id -> (局部坐标原点, QPixmap)，图层或部件变化时失效
+        self._composite_cache = {}
+        # 按z_order从小到大排列的角色实例，只在增删实例或调整层级时重新排序
+        self._z_sorted = []
+        self._z_keys = []  # 与 _z_sorted 一一对应的z_order，供二分插入使用
+        # 角色实例未应用变换时的局部边界缓存：instance_id -> (min_x, min_y, max_x, max_y)
+        self._local_bounds = {}
+        # 图层图像的QPixmapCache键：id(PIL图像) -> (图像弱引用, 缓存键)，图像被回收时条目随之移除
+        self._pixmap_cache_keys = {}
+        
+        # 拖动角色时合并变换信号，最多约每16ms发出一次
+        self._pending_transform_id = None
+        self._transform_emit_timer = QTimer(self)
+        self._transform_emit_timer.setSingleShot(True)
+        self._transform_emit_timer.setInterval(16)
+        self._transform_emit_timer.timeout.connect(self._emitPendingTransform)
         
         # 启用鼠标跟踪
         self.setMouseTracking(True)
+        # 每次重绘都会自行填充，无需Qt先擦除背景
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent, True)
         
     def setBackgroundImage(self, image_path: str):
         """设置背景图片"""
         if os.path.exists(image_path):
             self.background_pixmap = QPixmap(image_path)
+            self._bg_scaled = None
+            self._bg_scaled_for = 0.0
             self.update()
     
     def clearBackground(self):
         """清除背景"""
         self.background_pixmap = None
+        self._bg_scaled = None
+        self._bg_scaled_for = 0.0
         self.update()
     
     def addCharacterInstance(self, instance_id: str, instance):
         """添加角色实例"""
+        if instance_id in self.character_instances:
+            self._unlinkInstance(self.character_instances[instance_id])
         self.character_instances[instance_id] = instance
+        
+        # 二分插入到相同z_order的实例之后，与按z_order稳定排序的结果一致
+        index = bisect.bisect_right(self._z_keys, instance.z_order)
+        self._z_keys.insert(index, instance.z_order)
+        self._z_sorted.insert(index, instance)
+        
         self.update()
     
     def removeCharacterInstance(self, instance_id: str):
         """删除角色实例"""
         if instance_id in self.character_instances:
-            del self.character_instances[instance_id]
+            self._unlinkInstance(self.character_instances.pop(instance_id))
+            self._composite_cache.pop(instance_id, None)
+            self._local_bounds.pop(instance_id, None)
             self.update()
     
     def updateCharacterInstance(self, instance_id: str):
-        """更新指定角色实例"""
+        """更新指定角色实例（图层或部件发生变化，需要重新合成）"""
+        self._composite_cache.pop(instance_id, None)
+        self._local_bounds.pop(instance_id, None)
+        self.update()
+    
+    def updateCharacterTransform(self, instance_id: str):
+        """仅更新角色实例的位置或缩放，复用已有的合成结果"""
+        self.update()
+    
+    def refreshZOrder(self):
+        """角色层级改变后重新排序并重绘"""
+        self._sortInstances()
         self.update()
     
+    def _sortInstances(self):
+        """按z_order重建角色实例的绘制顺序"""
+        self._z_sorted = sorted(self.character_instances.values(), key=attrgetter('z_order'))
+        self._z_keys = [instance.z_order for instance in self._z_sorted]
+    
+    def _unlinkInstance(self, instance):
+        """从绘制顺序中移除角色实例"""
+        index = self._z_sorted.index(instance)
+        del self._z_sorted[index]
+        del self._z_keys[index]
+    
     def setDragMode(self, mode: str):
         """设置拖拽模式"""
         self.drag_mode = mode
@@ -74,11 +157,24 @@ class Canvas(QWidget):
     def paintEvent(self, event):
         """重绘事件"""
         painter = QPainter(self)
+        self.paintCanvas(painter, event.rect())
+        painter.end()
+    
+    def paintCanvas(self, painter: QPainter, dirty_rect: QRect):
+        """绘制画布内容，只重绘 dirty_rect 覆盖的区域"""
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.setClipRect(dirty_rect)
         
-        # 填充画布背景为深灰色，便于查看
-        painter.fillRect(self.rect(), QColor(60, 60, 60))
+        # 填充画布背景为深灰色，便于查看；不透明背景图完全覆盖的部分不必填充
+        bg_rect = self.backgroundScreenRect()
+        if bg_rect.isNull():
+            painter.fillRect(dirty_rect, QColor(60, 60, 60))
+        elif not bg_rect.contains(dirty_rect):
+            painter.save()
+            painter.setClipRegion(QRegion(dirty_rect).subtracted(QRegion(bg_rect)))
+            painter.fillRect(dirty_rect, QColor(60, 60, 60))
+            painter.restore()
         
         # 计算居中偏移
         center_x = self.width() // 2
@@ -93,19 +189,56 @@ class Canvas(QWidget):
         if self.background_pixmap:
             bg_x = -self.background_pixmap.width() // 2
             bg_y = -self.background_pixmap.height() // 2
-            painter.drawPixmap(bg_x, bg_y, self.background_pixmap)
+            scaled_background = self.scaledBackground()
+            if scaled_background is None:
+                painter.drawPixmap(bg_x, bg_y, self.background_pixmap)
+            else:
+                # 预缩小的背景仍绘制到原尺寸的区域，剩余的少量缩放由 painter 完成
+                target = QRectF(bg_x, bg_y, self.background_pixmap.width(), self.background_pixmap.height())
+                painter.drawPixmap(target, scaled_background, QRectF(scaled_background.rect()))
+        
+        # 将重绘区域换算到画布坐标（含与 instanceScreenRect 相同的边距），
+        # 直接与缓存的实例边界比较，跳过视口外的角色，也不会为其生成合成图
+        margin = 8 / self.scale_factor
+        view_left, view_top = self.mapToCanvas(dirty_rect.left(), dirty_rect.top())
+        view_right, view_bottom = self.mapToCanvas(dirty_rect.right() + 1, dirty_rect.bottom() + 1)
+        view_left -= margin
+        view_top -= margin
+        view_right += margin
+        view_bottom += margin
         
         # 绘制所有角色实例，按z_order从小到大排序
-        sorted_instances = sorted(self.character_instances.values(), key=lambda x: x.z_order)
-        for instance in sorted_instances:
-            if instance.visible:
-                self.drawCharacterInstance(painter, instance)
+        for instance in self._z_sorted:
+            if not instance.visible:
+                continue
+            min_x, min_y, max_x, max_y = self.calculateInstanceBounds(instance)
+            if max_x < view_left or min_x > view_right or max_y < view_top or min_y > view_bottom:
+                continue
+            self.drawCharacterInstance(painter, instance)
         
         painter.restore()
         
         # 绘制网格线辅助对齐
         self.drawGrid(painter)
     
+    def scaledBackground(self) -> Optional[QPixmap]:
+        """获取与当前缩放档位匹配的缩小背景，不需要缩小时返回None"""
+        # 缩放比例向上取整到 (1/√2)^k 的几何档位，每档约跨3次滚轮缩放，连续缩放时复用同一张背景，
+        # 且档位不低于当前比例，不会损失所需分辨率
+        level = math.floor(round(-2 * math.log2(self.scale_factor), 6))
+        if level <= 0:
+            return None
+        bucket = 2 ** (-level / 2)
+        
+        if self._bg_scaled_for != bucket:
+            width = max(1, int(self.background_pixmap.width() * bucket))
+            height = max(1, int(self.background_pixmap.height() * bucket))
+            self._bg_scaled = self.background_pixmap.scaled(width, height,
+                                                            Qt.AspectRatioMode.KeepAspectRatio,
+                                                            Qt.TransformationMode.SmoothTransformation)
+            self._bg_scaled_for = bucket
+        return self._bg_scaled
+    
     def drawGrid(self, painter: QPainter):
         """绘制网格线"""
         painter.save()
@@ -122,39 +255,78 @@ class Canvas(QWidget):
     
     def drawCharacterInstance(self, painter: QPainter, instance):
         """绘制角色实例"""
+        entry = self._composite_cache.get(instance.instance_id)
+        if entry is None:
+            entry = self.renderComposite(instance)
+            self._composite_cache[instance.instance_id] = entry
+        
+        origin, pixmap = entry
+        if pixmap is None:
+            return
+        
         painter.save()
         
         # 应用实例变换
         painter.translate(instance.x_offset, instance.y_offset)
         painter.scale(instance.scale, instance.scale)
+        painter.drawPixmap(origin, pixmap)
         
-        # 获取所有要绘制的元素（包括图层和自定义部件）
-        all_elements = self.getAllDrawElements(instance)
-        
-        # 按z_order排序绘制所有元素
-        for element in all_elements:
+        painter.restore()
+    
+    def renderComposite(self, instance):
+        """将角色实例的所有图层和自定义部件合成为一张QPixmap，返回 (局部坐标原点, QPixmap)"""
+        # 收集绘制操作：(目标矩形, 缩放, QPixmap)，按z_order排序
+        draw_ops = []
+        for element in self.getAllDrawElements(instance):
             if element['type'] == 'layer':
-                # 绘制普通图层
-                layer = element['layer']
-                image = element['image']
-                pixmap = self.pilToQPixmap(image)
+                pixmap = self.pilToQPixmap(element['image'])
                 if pixmap:
-                    x, y = layer['position']
-                    painter.drawPixmap(x, y, pixmap)
+                    x, y = element['layer']['position']
+                    draw_ops.append((QRectF(x, y, pixmap.width(), pixmap.height()), 1.0, pixmap))
                     
             elif element['type'] == 'custom_component':
-                # 绘制自定义部件
                 component = element['component']
                 if component.visible and component.image:
-                    painter.save()
-                    painter.translate(component.x, component.y)
-                    painter.scale(component.scale, component.scale)
                     pixmap = self.pilToQPixmap(component.image)
                     if pixmap:
-                        painter.drawPixmap(0, 0, pixmap)
-                    painter.restore()
+                        rect = QRectF(component.x, component.y,
+                                      pixmap.width() * component.scale, pixmap.height() * component.scale)
+                        draw_ops.append((rect, component.scale, pixmap))
         
-        painter.restore()
+        bounds = QRectF()
+        for rect, _, _ in draw_ops:
+            bounds = bounds.united(rect)
+        bounds = bounds.toAlignedRect()
+        if bounds.isEmpty():
+            return QPoint(), None
+        
+        composite = QPixmap(bounds.size())
+        composite.fill(Qt.GlobalColor.transparent)
+        
+        painter = QPainter(composite)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.translate(-bounds.x(), -bounds.y())
+        # 连续使用同一QPixmap的绘制操作合并为一次 drawPixmapFragments，
+        # 只合并相邻的操作，保持z_order不变
+        for _, run in itertools.groupby(draw_ops, key=lambda op: op[2].cacheKey()):
+            run = list(run)
+            if len(run) == 1:
+                rect, scale, pixmap = run[0]
+                painter.save()
+                painter.translate(rect.x(), rect.y())
+                painter.scale(scale, scale)
+                painter.drawPixmap(0, 0, pixmap)
+                painter.restore()
+            else:
+                pixmap = run[0][2]
+                source = QRectF(pixmap.rect())
+                fragments = [QPainter.PixmapFragment.create(rect.center(), source, scale, scale)
+                             for rect, scale, _ in run]
+                painter.drawPixmapFragments(fragments, pixmap)
+        painter.end()
+        
+        return bounds.topLeft(), composite
     
     def getAllDrawElements(self, instance):
         """获取角色实例的所有绘制元素（图层+自定义部件），按z_order排序"""
@@ -188,25 +360,39 @@ class Canvas(QWidget):
         return elements
     
     def pilToQPixmap(self, pil_image):
-        """将PIL图像转换为QPixmap"""
+        """将PIL图像转换为QPixmap（结果存入全局的QPixmapCache，重绘时直接复用）"""
+        # 每个PIL图像对象分配一个唯一的缓存键，图像被替换后旧键自然不再命中；
+        # 弱引用校验对象身份，id 被新图像复用时不会误命中
+        image_id = id(pil_image)
+        entry = self._pixmap_cache_keys.get(image_id)
+        if entry is not None and entry[0]() is pil_image:
+            key = entry[1]
+            pixmap = QPixmapCache.find(key)
+            if pixmap is not None:
+                return pixmap
+        else:
+            key = f"layer:{next(_pixmap_keys)}"
+            image_ref = weakref.ref(pil_image,
+                                    lambda ref, image_id=image_id: self._forgetPixmapKey(image_id, ref))
+            self._pixmap_cache_keys[image_id] = (image_ref, key)
+        
         try:
-            # 转换为RGBA模式
-            if pil_image.mode != 'RGBA':
-                pil_image = pil_image.convert('RGBA')
-            
-            # 获取图像数据
-            data = pil_image.tobytes('raw', 'RGBA')
-            width, height = pil_image.size
-            
-            # 创建QImage，然后转换为QPixmap
-            qimage = QImage(data, width, height, QImage.Format.Format_RGBA8888)
-            pixmap = QPixmap.fromImage(qimage)
+            # QPixmapCache 中的 QPixmap 可能比原始数据存活更久，需使用拥有自身像素的QImage
+            pixmap = QPixmap.fromImage(pil_to_qimage(pil_image))
+            QPixmapCache.insert(key, pixmap)
             return pixmap
             
         except Exception as e:
             print(f"图像转换失败: {e}")
             return None
     
+    def _forgetPixmapKey(self, image_id, image_ref):
+        """PIL图像被回收时移除其缓存键，并从QPixmapCache中释放对应的QPixmap"""
+        entry = self._pixmap_cache_keys.get(image_id)
+        if entry is not None and entry[0] is image_ref:
+            del self._pixmap_cache_keys[image_id]
+            QPixmapCache.remove(entry[1])
+    
     def mousePressEvent(self, event: QMouseEvent):
         """鼠标按下事件"""
         if event.button() == Qt.MouseButton.LeftButton:
@@ -233,23 +419,36 @@ class Canvas(QWidget):
                 # 移动角色
                 instance = self.character_instances.get(self.selected_instance)
                 if instance:
+                    old_rect = self.instanceScreenRect(instance)
                     instance.x_offset += delta.x() / self.scale_factor
                     instance.y_offset += delta.y() / self.scale_factor
-                    self.update()
-                    # 发出角色变换改变信号
-                    self.characterTransformChanged.emit(self.selected_instance)
+                    # 只重绘角色移动前后覆盖的区域
+                    self.update(old_rect.united(self.instanceScreenRect(instance)))
+                    # 角色变换改变信号由定时器合并后发出
+                    self._pending_transform_id = self.selected_instance
+                    if not self._transform_emit_timer.isActive():
+                        self._transform_emit_timer.start()
             
             self.drag_start = event.position().toPoint()
     
     def mouseReleaseEvent(self, event: QMouseEvent):
         """鼠标释放事件"""
-        # 如果刚刚拖动了角色，发出最终的变换改变信号
+        # 如果刚刚拖动了角色，立即发出最终的变换改变信号
+        self._transform_emit_timer.stop()
+        self._pending_transform_id = None
         if self.drag_mode == "character" and self.selected_instance:
             self.characterTransformChanged.emit(self.selected_instance)
         
         self.drag_start = None
         self.selected_instance = None
     
+    def _emitPendingTransform(self):
+        """发出拖动过程中合并的角色变换改变信号"""
+        instance_id = self._pending_transform_id
+        self._pending_transform_id = None
+        if instance_id:
+            self.characterTransformChanged.emit(instance_id)
+    
     def wheelEvent(self, event: QWheelEvent):
         """鼠标滚轮事件"""
         # 缩放画布
@@ -270,16 +469,50 @@ class Canvas(QWidget):
     
     def screenToCanvas(self, screen_pos: QPoint) -> QPoint:
         """屏幕坐标转画布坐标"""
-        center_x = self.width() // 2
-        center_y = self.height() // 2
-        canvas_x = (screen_pos.x() - center_x - self.offset_x) / self.scale_factor
-        canvas_y = (screen_pos.y() - center_y - self.offset_y) / self.scale_factor
+        canvas_x, canvas_y = self.mapToCanvas(screen_pos.x(), screen_pos.y())
         return QPoint(int(canvas_x), int(canvas_y))
     
+    def mapToCanvas(self, x, y) -> tuple:
+        """控件坐标转画布坐标（不取整）"""
+        return ((x - self.width() // 2 - self.offset_x) / self.scale_factor,
+                (y - self.height() // 2 - self.offset_y) / self.scale_factor)
+    
+    def backgroundScreenRect(self) -> QRect:
+        """计算不透明背景图在控件坐标系中完全覆盖的像素矩形，无背景或背景带透明通道时返回空矩形"""
+        if not self.background_pixmap or self.background_pixmap.hasAlphaChannel():
+            return QRect()
+        
+        origin_x = self.width() // 2 + self.offset_x
+        origin_y = self.height() // 2 + self.offset_y
+        left = origin_x + (-self.background_pixmap.width() // 2) * self.scale_factor
+        top = origin_y + (-self.background_pixmap.height() // 2) * self.scale_factor
+        right = left + self.background_pixmap.width() * self.scale_factor
+        bottom = top + self.background_pixmap.height() * self.scale_factor
+        # 边缘像素只被部分覆盖（平滑缩放时会与底色混合），向内取整
+        left, top = math.ceil(left), math.ceil(top)
+        right, bottom = math.floor(right), math.floor(bottom)
+        if right <= left or bottom <= top:
+            return QRect()
+        return QRect(left, top, right - left, bottom - top)
+    
+    def instanceScreenRect(self, instance, margin: int = 8) -> QRect:
+        """计算角色实例在控件坐标系中的包围矩形，margin 用于覆盖抗锯齿的边缘"""
+        min_x, min_y, max_x, max_y = self.calculateInstanceBounds(instance)
+        if min_x == max_x or min_y == max_y:
+            return QRect()
+        
+        origin_x = self.width() // 2 + self.offset_x
+        origin_y = self.height() // 2 + self.offset_y
+        rect = QRectF(origin_x + min_x * self.scale_factor,
+                      origin_y + min_y * self.scale_factor,
+                      (max_x - min_x) * self.scale_factor,
+                      (max_y - min_y) * self.scale_factor)
+        return rect.toAlignedRect().adjusted(-margin, -margin, margin, margin)
+    
     def findCharacterAt(self, pos: QPoint) -> Optional[str]:
         """查找指定位置的角色"""
-        # 从上到下查找（逆序）
-        for instance in reversed(list(self.character_instances.values())):
+        # 按层级从上到下查找（逆序）
+        for instance in reversed(self._z_sorted):
             if instance.visible and self.pointInInstance(pos, instance):
                 return instance.instance_id
         return None
@@ -291,52 +524,87 @@ class Canvas(QWidget):
     
     def calculateInstanceBounds(self, instance) -> tuple:
         """计算角色实例的边界（包括自定义部件）"""
-        if not instance.composition_layers and not (hasattr(instance, 'custom_components') and instance.custom_components.components):
+        if instance.instance_id in self._local_bounds:
+            bounds = self._local_bounds[instance.instance_id]
+        else:
+            bounds = self._calculateLocalBounds(instance)
+            self._local_bounds[instance.instance_id] = bounds
+        if bounds is None:
             return (0, 0, 0, 0)
         
+        # 局部边界只需经过实例的缩放和平移即可得到最终边界
+        min_x, min_y, max_x, max_y = bounds
+        scale = instance.scale
+        return (min_x * scale + instance.x_offset, min_y * scale + instance.y_offset,
+                max_x * scale + instance.x_offset, max_y * scale + instance.y_offset)
+    
+    def _calculateLocalBounds(self, instance) -> Optional[tuple]:
+        """计算角色实例未应用变换时的边界，没有任何元素时返回None"""
         min_x = float('inf')
         min_y = float('inf')
         max_x = float('-inf')
         max_y = float('-inf')
         
-        # 考虑居中偏移
-        center_offset_x = 0  # 背景图片已经在绘制时居中
-        center_offset_y = 0
-        
         # 计算普通图层边界
-        for layer_id, layer in instance.composition_layers.items():
-            x, y = layer['position']
-            width, height = layer['size']
-            
-            final_x = (x + center_offset_x) * instance.scale + instance.x_offset
-            final_y = (y + center_offset_y) * instance.scale + instance.y_offset
-            scaled_width = width * instance.scale
-            scaled_height = height * instance.scale
-            
-            min_x = min(min_x, final_x)
-            min_y = min(min_y, final_y)
-            max_x = max(max_x, final_x + scaled_width)
-            max_y = max(max_y, final_y + scaled_height)
+        layers = instance.composition_layers.values()
+        if NUMPY_AVAILABLE and layers:
+            # 将图层位置和尺寸整理为 N×2 数组，一次归约得到边界
+            positions = np.array([layer['position'] for layer in layers])
+            ends = positions + np.array([layer['size'] for layer in layers])
+            min_x, min_y = positions.min(axis=0).tolist()
+            max_x, max_y = ends.max(axis=0).tolist()
+        else:
+            for layer in layers:
+                x, y = layer['position']
+                width, height = layer['size']
+                
+                min_x = min(min_x, x)
+                min_y = min(min_y, y)
+                max_x = max(max_x, x + width)
+                max_y = max(max_y, y + height)
         
-        # 计算自定义部件边界
-        if hasattr(instance, 'custom_components') and instance.custom_components.components:
+        # 计算自定义部件边界（应用部件自身缩放）
+        if hasattr(instance, 'custom_components'):
             for component in instance.custom_components.components:
-                comp_x, comp_y = component.x, component.y
                 comp_width, comp_height = component.image.size
                 
-                # 应用角色变换和部件自身缩放
-                final_x = comp_x * instance.scale + instance.x_offset
-                final_y = comp_y * instance.scale + instance.y_offset
-                scaled_width = comp_width * component.scale * instance.scale
-                scaled_height = comp_height * component.scale * instance.scale
-                
-                min_x = min(min_x, final_x)
-                min_y = min(min_y, final_y)
-                max_x = max(max_x, final_x + scaled_width)
-                max_y = max(max_y, final_y + scaled_height)
+                min_x = min(min_x, component.x)
+                min_y = min(min_y, component.y)
+                max_x = max(max_x, component.x + comp_width * component.scale)
+                max_y = max(max_y, component.y + comp_height * component.scale)
         
-        # 如果没有任何元素，返回默认边界
+        # 如果没有任何元素，返回None
         if min_x == float('inf'):
-            return (0, 0, 0, 0)
+            return None
         
         return (min_x, min_y, max_x, max_y)
+
+
+class Canvas(_CanvasMixin, QWidget):
+    """高性能画布组件"""
+    characterSelected = pyqtSignal(str)  # instance_id
+    characterTransformChanged = pyqtSignal(str)  # instance_id - 当角色变换改变时发出
+
+
+if OPENGL_AVAILABLE:
+    class GLCanvas(_CanvasMixin, QOpenGLWidget):
+        """使用OpenGL绘制的画布，缩放与混合由GPU完成，QPixmap上传为纹理后跨帧复用"""
+        characterSelected = pyqtSignal(str)  # instance_id
+        characterTransformChanged = pyqtSignal(str)  # instance_id - 当角色变换改变时发出
+        
+        def paintEvent(self, event):
+            """交给 QOpenGLWidget 准备好OpenGL上下文后再调用 paintGL"""
+            QOpenGLWidget.paintEvent(self, event)
+        
+        def paintGL(self):
+            """OpenGL重绘，每次都重绘整个画布"""
+            painter = QPainter(self)
+            self.paintCanvas(painter, self.rect())
+            painter.end()
+
+
+def create_canvas():
+    """创建画布，能够创建OpenGL上下文时使用GLCanvas，否则使用光栅绘制的Canvas"""
+    if OPENGL_AVAILABLE and QOpenGLContext().create():
+        return GLCanvas()
+    return Canvas()
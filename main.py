@@ -9,6 +9,7 @@ import sys
 import os
 import webbrowser
 from PyQt6.QtWidgets import QApplication, QMessageBox
+from PyQt6.QtGui import QPixmapCache
 from ginka_composer.ui import ModernCharacterComposer
 
 
@@ -82,6 +83,9 @@ Live2D工具包括:
     app.setApplicationVersion("1.0.0")
     app.setOrganizationName("GINKA Team")
     
+    # 画布图层与预览共用全局的QPixmapCache，上限256MB（单位KB）
+    QPixmapCache.setCacheLimit(256 * 1024)
+    
     try:
         # 创建主窗口
         window = ModernCharacterComposer()